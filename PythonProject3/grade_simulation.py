@@ -0,0 +1,230 @@
+import bisect
+import math
+import random
+import zlib
+
+# numpy is optional: without it PurePythonGradeSimulator generates the grades
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# -------- STUDENT PROFILES --------
+# Ability is a z-score: 0 is an average student, positive is better.
+# profile name: (mean ability, spread of ability within the profile)
+PROFILES = {
+    "excellent": (1.2, 0.35),
+    "good": (0.5, 0.35),
+    "average": (0.0, 0.40),
+    "struggling": (-0.9, 0.45),
+}
+
+# Share of each profile when students are not given one explicitly
+PROFILE_WEIGHTS = {
+    "excellent": 0.15,
+    "good": 0.35,
+    "average": 0.35,
+    "struggling": 0.15,
+}
+
+# Lab and PE subjects are graded more leniently than lectures
+EASY_SUBJECT_PREFIXES = ("PE",)
+EASY_SUBJECT_BONUS = 0.25
+
+
+class BaseGradeSimulator:
+    """Turns simulated period grades into grade rows; subclasses implement simulate()"""
+
+    def simulate(self, n_students, subject_codes, profiles=None):
+        """Return (prelim, midterm, finals) period grades as lists of n_students lists of len(subject_codes)"""
+        raise NotImplementedError
+
+    def grade_rows(self, student_ids, semester_subjects, profiles=None):
+        """Rows in grades-table column order for every student and every subject:
+
+        (student_id, subject_code, subject_desc, units, semester, prelim, midterm, finals)
+
+        finals is the finals period grade; the final grade is computed from all
+        three by the grading policy when the rows are inserted.
+
+        All semesters are simulated in one call so a student's ability carries
+        across semesters.
+        """
+        subjects = [(sem, code, desc, units)
+                    for sem, sem_subjects in semester_subjects.items()
+                    for code, desc, units in sem_subjects]
+        if not subjects or not len(student_ids):
+            return []
+
+        prelim, midterm, finals = self.simulate(len(student_ids), [s[1] for s in subjects], profiles)
+        return [(sid, code, desc, units, sem, prelim[i][j], midterm[i][j], finals[i][j])
+                for i, sid in enumerate(student_ids)
+                for j, (sem, code, desc, units) in enumerate(subjects)]
+
+
+def is_easy_subject(subject_code):
+    return subject_code.endswith("L") or subject_code.startswith(EASY_SUBJECT_PREFIXES)
+
+
+class GradeSimulator(BaseGradeSimulator):
+    """Seeded, vectorized generator of correlated prelim/midterm/final grades.
+
+    performance(student, subject) = ability - difficulty + subject noise
+    period score = performance + improvement * period + correlated period noise
+
+    Scores are mapped onto the grade scale (lower is better) and snapped to
+    the nearest official grade value.
+    """
+
+    def __init__(self, grade_values, seed=None, subject_noise=0.35, period_noise=0.30,
+                 period_correlation=0.7, improvement=0.10):
+        self.grade_values = np.sort(np.asarray(grade_values, dtype=float))
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.subject_noise = subject_noise
+        self.period_noise = period_noise
+        self.improvement = improvement
+
+        # AR(1) covariance between prelim, midterm and final noise
+        lags = np.abs(np.subtract.outer(np.arange(3), np.arange(3)))
+        self.period_cholesky = np.linalg.cholesky(period_correlation ** lags)
+
+        # 0 ability lands mid-scale, +-2 reaches the best/worst grade
+        self.center = (self.grade_values[0] + self.grade_values[-1]) / 2
+        self.scale = (self.grade_values[-1] - self.grade_values[0]) / 4
+        self.midpoints = (self.grade_values[1:] + self.grade_values[:-1]) / 2
+
+        self.difficulty_cache = {}
+
+    def subject_difficulty(self, subject_code):
+        """Difficulty of a subject (z-score), stable for a given seed and subject code"""
+        if subject_code not in self.difficulty_cache:
+            entropy = [zlib.crc32(subject_code.encode())]
+            if self.seed is not None:
+                entropy.append(self.seed)
+            difficulty = np.random.default_rng(entropy).normal(0.0, 0.3)
+            if is_easy_subject(subject_code):
+                difficulty -= EASY_SUBJECT_BONUS
+            self.difficulty_cache[subject_code] = difficulty
+        return self.difficulty_cache[subject_code]
+
+    def assign_profiles(self, n_students):
+        """Random profile names drawn with PROFILE_WEIGHTS"""
+        names = list(PROFILE_WEIGHTS)
+        weights = np.array([PROFILE_WEIGHTS[name] for name in names])
+        picks = self.rng.choice(len(names), size=n_students, p=weights / weights.sum())
+        return [names[i] for i in picks]
+
+    def abilities(self, profiles):
+        """Ability of each student drawn from their profile"""
+        means = np.array([PROFILES[p][0] for p in profiles])
+        spreads = np.array([PROFILES[p][1] for p in profiles])
+        return self.rng.normal(means, spreads)
+
+    def to_grades(self, scores):
+        """Map z-scores onto the official grade values (higher score -> lower grade)"""
+        continuous = self.center - scores * self.scale
+        return self.grade_values[np.searchsorted(self.midpoints, continuous)]
+
+    def simulate(self, n_students, subject_codes, profiles=None):
+        prelim, midterm, finals = self.simulate_arrays(n_students, subject_codes, profiles)
+        return prelim.tolist(), midterm.tolist(), finals.tolist()
+
+    def simulate_arrays(self, n_students, subject_codes, profiles=None):
+        """Return (prelim, midterm, finals) period grade arrays shaped (n_students, len(subject_codes))"""
+        if profiles is None:
+            profiles = self.assign_profiles(n_students)
+        profiles = [p if p is not None else self.assign_profiles(1)[0] for p in profiles]
+        if len(profiles) != n_students:
+            raise ValueError("profiles must have one entry per student")
+
+        n_subjects = len(subject_codes)
+        ability = self.abilities(profiles)
+        difficulty = np.array([self.subject_difficulty(code) for code in subject_codes])
+        trend = self.rng.normal(self.improvement, self.improvement, size=n_students)
+
+        performance = (ability[:, None] - difficulty[None, :]
+                       + self.rng.normal(0.0, self.subject_noise, size=(n_students, n_subjects)))
+
+        noise = self.rng.standard_normal((n_students, n_subjects, 3)) @ self.period_cholesky.T
+        periods = np.arange(3)
+        scores = (performance[:, :, None] + trend[:, None, None] * periods
+                  + noise * self.period_noise)
+
+        grades = self.to_grades(scores)
+        return grades[:, :, 0], grades[:, :, 1], grades[:, :, 2]
+
+
+class PurePythonGradeSimulator(BaseGradeSimulator):
+    """The same grade model as GradeSimulator without numpy, one grade at a time.
+
+    Fine for adding a student; seeding thousands is much faster with numpy.
+    The random streams differ, so a seed does not reproduce GradeSimulator's grades.
+    """
+
+    def __init__(self, grade_values, seed=None, subject_noise=0.35, period_noise=0.30,
+                 period_correlation=0.7, improvement=0.10):
+        self.grade_values = sorted(float(value) for value in grade_values)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.subject_noise = subject_noise
+        self.period_noise = period_noise
+        self.improvement = improvement
+
+        # Cholesky factor of the AR(1) correlation between prelim, midterm and final noise
+        r = period_correlation
+        s = math.sqrt(1 - r * r)
+        self.period_cholesky = ((1.0, 0.0, 0.0), (r, s, 0.0), (r * r, r * s, s))
+
+        self.center = (self.grade_values[0] + self.grade_values[-1]) / 2
+        self.scale = (self.grade_values[-1] - self.grade_values[0]) / 4
+        self.midpoints = [(a + b) / 2 for a, b in zip(self.grade_values, self.grade_values[1:])]
+
+        self.difficulty_cache = {}
+
+    def subject_difficulty(self, subject_code):
+        """Difficulty of a subject (z-score), stable for a given seed and subject code"""
+        if subject_code not in self.difficulty_cache:
+            difficulty = random.Random(f"{zlib.crc32(subject_code.encode())}:{self.seed}").gauss(0.0, 0.3)
+            if is_easy_subject(subject_code):
+                difficulty -= EASY_SUBJECT_BONUS
+            self.difficulty_cache[subject_code] = difficulty
+        return self.difficulty_cache[subject_code]
+
+    def to_grade(self, score):
+        continuous = self.center - score * self.scale
+        return self.grade_values[bisect.bisect_left(self.midpoints, continuous)]
+
+    def simulate(self, n_students, subject_codes, profiles=None):
+        if profiles is None:
+            profiles = [None] * n_students
+        if len(profiles) != n_students:
+            raise ValueError("profiles must have one entry per student")
+        names = list(PROFILE_WEIGHTS)
+        weights = [PROFILE_WEIGHTS[name] for name in names]
+        difficulty = [self.subject_difficulty(code) for code in subject_codes]
+
+        grades = ([], [], [])
+        for profile in profiles:
+            if profile is None:
+                profile = self.rng.choices(names, weights)[0]
+            mean, spread = PROFILES[profile]
+            ability = self.rng.gauss(mean, spread)
+            trend = self.rng.gauss(self.improvement, self.improvement)
+            rows = ([], [], [])
+            for subject_difficulty in difficulty:
+                performance = ability - subject_difficulty + self.rng.gauss(0.0, self.subject_noise)
+                z = [self.rng.gauss(0.0, 1.0) for _ in range(3)]
+                for period, row in enumerate(self.period_cholesky):
+                    noise = sum(c * x for c, x in zip(row, z))
+                    rows[period].append(self.to_grade(performance + trend * period + noise * self.period_noise))
+            for period in range(3):
+                grades[period].append(rows[period])
+        return grades
+
+
+def make_grade_simulator(grade_values, seed=None):
+    """GradeSimulator when numpy is installed, PurePythonGradeSimulator otherwise"""
+    if np is None:
+        return PurePythonGradeSimulator(grade_values, seed=seed)
+    return GradeSimulator(grade_values, seed=seed)
@@ -0,0 +1,176 @@
+import csv
+import os
+from collections import deque
+
+from grading import GRADE_VALUES, FAILING_GRADE
+from repository import GradeRepo, OutboxRepo, StudentRepo
+
+# -------- GRADE SHEET FORMAT --------
+# One row per student and subject. prelim / midterm / finals may be left out or
+# blank; only the periods that are filled in are written. The final grade is
+# recomputed by the grading policy.
+#
+#   student_number,subject_code,semester,prelim,midterm,finals
+#   123456,IT215,"SY 2025-2026, 1st Semester",1.25,1.50,1.75
+KEY_COLUMNS = ("student_number", "subject_code", "semester")
+PERIOD_COLUMNS = ("prelim", "midterm", "finals")
+ALLOWED_GRADES = set(GRADE_VALUES) | {FAILING_GRADE}
+
+BATCH_SIZE = 5000
+
+
+class GradeSheetError(Exception):
+    """The grade sheet cannot be imported at all (e.g. missing columns)"""
+
+
+def read_batches(path, batch_size=BATCH_SIZE):
+    """Stream (line_number, row dict) batches from a CSV grade sheet"""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = [name.strip().lower() for name in next(reader, [])]
+        missing = [name for name in KEY_COLUMNS if name not in header]
+        if missing:
+            raise GradeSheetError(f"Missing column(s): {', '.join(missing)}")
+        if not any(name in header for name in PERIOD_COLUMNS):
+            raise GradeSheetError(f"Expected at least one of: {', '.join(PERIOD_COLUMNS)}")
+
+        batch = []
+        for values in reader:
+            if not any(value.strip() for value in values):
+                continue
+            batch.append((reader.line_num, dict(zip(header, values))))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def parse_grade(value):
+    """Float grade, None for a blank cell; ValueError if it is not an official grade"""
+    value = (value or "").strip()
+    if not value:
+        return None
+    grade = round(float(value), 2)
+    if grade not in ALLOWED_GRADES:
+        raise ValueError(f"{value} is not an official grade")
+    return grade
+
+
+def validate_batch(batch, catalog, archived_years):
+    """Worker: split a batch into valid rows and rejects
+
+    catalog: {semester: {subject_code: (subject_desc, units)}}
+    Valid rows are (line, student_number, subject_code, semester, prelim, midterm, finals, row dict);
+    rejects are (line, row dict, reason).
+    """
+    valid = []
+    rejects = []
+    for line, row in batch:
+        student_number = (row.get("student_number") or "").strip()
+        code = (row.get("subject_code") or "").strip().upper()
+        semester = (row.get("semester") or "").strip()
+
+        if not student_number or not code or not semester:
+            rejects.append((line, row, "student_number, subject_code and semester are required"))
+            continue
+        if semester not in catalog:
+            rejects.append((line, row, f"unknown semester '{semester}'"))
+            continue
+        if semester.split(",")[0].strip() in archived_years:
+            rejects.append((line, row, "school year is archived"))
+            continue
+        if code not in catalog[semester]:
+            rejects.append((line, row, f"{code} is not offered in {semester}"))
+            continue
+
+        try:
+            grades = [parse_grade(row.get(period)) for period in PERIOD_COLUMNS]
+        except ValueError as e:
+            rejects.append((line, row, str(e)))
+            continue
+        if all(grade is None for grade in grades):
+            rejects.append((line, row, "no grades"))
+            continue
+
+        valid.append((line, student_number, code, semester, *grades, row))
+    return valid, rejects
+
+
+def validated_batches(path, catalog, archived_years, workers=None, batch_size=BATCH_SIZE):
+    """Yield (valid, rejects) per batch, validated in a process pool in file order
+
+    At most two batches per worker are in flight, so memory stays flat for any file size.
+    """
+    batches = read_batches(path, batch_size)
+    if workers == 1:
+        for batch in batches:
+            yield validate_batch(batch, catalog, archived_years)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append(pool.submit(validate_batch, batch, catalog, archived_years))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def import_grade_sheet(conn, path, semester_subjects, archived_years, policy, workers=None,
+                       batch_size=BATCH_SIZE, report_path=None):
+    """Upsert a CSV grade sheet into grades, one transaction per batch
+
+    Rejected rows are written to ``report_path`` (default: <sheet>.rejects.csv).
+    Returns (imported, rejected, report_path or None).
+    """
+    catalog = {sem: {code: (desc, units) for code, desc, units in subjects}
+               for sem, subjects in semester_subjects.items()}
+    student_ids = StudentRepo(conn).ids_by_number()
+    # Used by GradeRepo.upsert_periods
+    conn.create_function("policy_final_grade", 3, policy.final_grade, deterministic=True)
+    grades = GradeRepo(conn)
+    outbox = OutboxRepo(conn)
+
+    if report_path is None:
+        report_path = os.path.splitext(path)[0] + ".rejects.csv"
+    imported = 0
+    rejected = 0
+    report_file = None
+    report = None
+
+    try:
+        for valid, rejects in validated_batches(path, catalog, set(archived_years), workers, batch_size):
+            params = []
+            for line, student_number, code, semester, prelim, midterm, finals, row in valid:
+                student_id = student_ids.get(student_number)
+                if student_id is None:
+                    rejects.append((line, row, "unknown student number"))
+                    continue
+                desc, units = catalog[semester][code]
+                params.append({"student_id": student_id, "subject_code": code, "subject_desc": desc,
+                               "units": units, "semester": semester,
+                               "prelim": prelim, "midterm": midterm, "finals": finals})
+            with conn:
+                grades.upsert_periods(params)
+                outbox.record_inserts([(p["student_id"], p["semester"], p["subject_code"]) for p in params],
+                                      kind="upsert")
+            imported += len(params)
+
+            if rejects:
+                if report is None:
+                    report_file = open(report_path, "w", newline="", encoding="utf-8")
+                    report = csv.writer(report_file)
+                    report.writerow(["line", *KEY_COLUMNS, *PERIOD_COLUMNS, "reason"])
+                for line, row, reason in rejects:
+                    report.writerow([line, *(row.get(name, "") for name in KEY_COLUMNS + PERIOD_COLUMNS), reason])
+                rejected += len(rejects)
+    finally:
+        if report_file is not None:
+            report_file.close()
+
+    return imported, rejected, report_path if rejected else None
@@ -0,0 +1,168 @@
+import json
+import os
+import sqlite3
+from dataclasses import asdict, dataclass
+
+from repository import GradeRepo, OutboxRepo, StudentRepo
+
+# -------- GRADING SYSTEM REFERENCE --------
+# Philippine 1.00-Based Grading System
+# Final Grade = prelim × prelim_weight + midterm × midterm_weight + finals × final_weight,
+#               rounded to the nearest official grade value (5.00 when failing)
+# GWA Calculation: Total GWA = Σ(Grade × Units) ÷ Σ(Units)
+
+# OFFICIAL GRADE VALUES ONLY
+GRADE_VALUES = [1.00, 1.25, 1.50, 1.75, 2.00, 2.25, 2.50, 2.75]
+FAILING_GRADE = 5.00
+
+
+@dataclass(frozen=True)
+class GradingPolicy:
+    """How a subject's final grade is computed from its period grades"""
+    prelim_weight: float = 0.3
+    midterm_weight: float = 0.3
+    final_weight: float = 0.4
+    # Weighted averages above this fail the subject
+    failing_threshold: float = 3.00
+    failing_grade: float = FAILING_GRADE
+
+    def __post_init__(self):
+        total = self.prelim_weight + self.midterm_weight + self.final_weight
+        if abs(total - 1.0) > 1e-9:
+            raise ValueError(f"Grading weights must add up to 1.0 (got {total:g})")
+
+    @classmethod
+    def load(cls, path):
+        """Read a policy from a JSON file; the default policy if the file does not exist"""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, encoding="utf-8") as f:
+            return cls(**json.load(f))
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(asdict(self), f, indent=4)
+
+    def round_grade(self, raw):
+        """Nearest official grade value; ties go to the better (lower) grade"""
+        raw = round(raw, 4)
+        if raw > self.failing_threshold:
+            return self.failing_grade
+        return min(GRADE_VALUES, key=lambda value: (abs(value - raw), value))
+
+    def final_grade(self, prelim, midterm, finals):
+        """Final grade from the three period grades, or None if one of them is not a number"""
+        try:
+            raw = (float(prelim) * self.prelim_weight
+                   + float(midterm) * self.midterm_weight
+                   + float(finals) * self.final_weight)
+        except (TypeError, ValueError):
+            return None
+        return self.round_grade(raw)
+
+    def is_failing(self, grade):
+        try:
+            return float(grade) > self.failing_threshold
+        except (TypeError, ValueError):
+            return False
+
+
+def weighted_average(pairs):
+    """Σ(Grade × Units) ÷ Σ(Units) over (units, grade) pairs, rounded to 2 places
+
+    Returns (average, total_units); average is None when there are no numeric grades.
+    """
+    weighted = 0
+    total_units = 0
+    for units, grade in pairs:
+        try:
+            grade = float(grade)
+            units = int(units)
+        except (TypeError, ValueError):
+            continue
+        weighted += grade * units
+        total_units += units
+    if total_units == 0:
+        return None, 0
+    return round(weighted / total_units, 2), total_units
+
+
+# -------- WHOLE-SCHOOL RECOMPUTATION --------
+def compute_partition(db_path, policy, low_id, high_id):
+    """Worker: new final grades for students low_id..high_id as (final_grade, grade_id, version) rows
+
+    Opens its own read-only connection and only returns rows whose grade changes.
+    """
+    reader = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        rows = GradeRepo(reader).final_grade_inputs(low_id, high_id)
+    finally:
+        reader.close()
+    return changed_grades(rows, policy)
+
+
+def changed_grades(rows, policy):
+    """(final_grade, grade_id, version) for the (id, prelim, midterm, finals, final_grade, version) rows
+    whose grade changes"""
+    changes = []
+    for grade_id, prelim, midterm, finals, current, version in rows:
+        new = policy.final_grade(prelim, midterm, finals)
+        if new is None:
+            continue
+        try:
+            if float(current) == new:
+                continue
+        except (TypeError, ValueError):
+            pass
+        changes.append((new, grade_id, version))
+    return changes
+
+
+def recompute_grades(conn, db_path, policy, workers=None, partition_size=2000, chunk_size=5000):
+    """Apply ``policy`` to every grade in the grades table of ``db_path``
+
+    Students are split into id ranges that are computed in a process pool;
+    the changed rows are written back through ``conn`` in chunked transactions.
+    With no ``db_path`` (an in-memory database) everything runs on ``conn`` in this process.
+    Returns the number of grades that changed.
+    """
+    low_id, high_id = StudentRepo(conn).id_range()
+    if low_id is None:
+        return 0
+    partitions = [(low, min(low + partition_size - 1, high_id))
+                  for low in range(low_id, high_id + 1, partition_size)]
+
+    grades = GradeRepo(conn)
+    outbox = OutboxRepo(conn)
+
+    def write(changes):
+        written = 0
+        for start in range(0, len(changes), chunk_size):
+            chunk = changes[start:start + chunk_size]
+            with conn:
+                updated = grades.update_final_grades(chunk)
+                if updated < len(chunk):
+                    # Some grades were edited after the partition was read. This
+                    # transaction holds the write lock now, so recompute the chunk
+                    # from the current rows; the ones just written come out unchanged.
+                    current = grades.final_grade_inputs_by_id(grade_id for _, grade_id, _ in chunk)
+                    updated += grades.update_final_grades(changed_grades(current, policy))
+                # An edited grade that needed no new final grade gets an extra event; sinks de-duplicate
+                outbox.record_updates(grade_id for _, grade_id, _ in chunk)
+            written += updated
+        return written
+
+    if db_path is None:
+        return sum(write(changed_grades(grades.final_grade_inputs(low, high), policy)) for low, high in partitions)
+
+    if workers == 1 or len(partitions) == 1:
+        return sum(write(compute_partition(db_path, policy, low, high)) for low, high in partitions)
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    changed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(compute_partition, db_path, policy, low, high) for low, high in partitions]
+        for future in futures:
+            changed += write(future.result())
+    return changed
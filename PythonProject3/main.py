@@ -1,52 +1,377 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import sqlite3
-import random
-import hashlib
-from PIL import Image, ImageTk
+import os
+import sys
+import atexit
+import time
+from dataclasses import replace
+from datetime import datetime
+from itertools import groupby
+from grading import GRADE_VALUES, GradingPolicy, weighted_average, recompute_grades
+from repository import StudentRepo, GradeRepo, ReleaseRepo, OutboxRepo, STUDENT_SORT_COLUMNS
+
+# PIL, numpy (grade_simulation) and hashlib are imported where they are first
+# needed, so importing this module and showing the login window stays fast.
+# PIL and numpy are optional: without them the logo is an emoji and grades are
+# simulated in pure Python.
 
 # -------- DATABASE SETUP --------
 DB_FILE = "sis.db"
 
-conn = sqlite3.connect(DB_FILE)
-cursor = conn.cursor()
-
-# Create students table with password
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS students (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    student_number TEXT UNIQUE,
-    first_name TEXT,
-    middle_name TEXT,
-    last_name TEXT,
-    course TEXT,
-    password TEXT
-)
-""")
-
-# Create grades table with semester column and units
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS grades (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    student_id INTEGER,
-    subject_code TEXT,
-    subject_desc TEXT,
-    units INTEGER,
-    semester TEXT,
-    prelim TEXT,
-    midterm TEXT,
-    final_grade TEXT,
-    FOREIGN KEY(student_id) REFERENCES students(id)
-)
-""")
-conn.commit()
-
-# -------- GRADING SYSTEM REFERENCE --------
-# Philippine 1.00-Based Grading System
-# GWA Calculation: Total GWA = Σ(Grade × Units) ÷ Σ(Units)
-
-# OFFICIAL GRADE VALUES ONLY
-GRADE_VALUES = [1.00, 1.25, 1.50, 1.75, 2.00, 2.25, 2.50, 2.75]
+# Bump whenever the schema below changes. Startup only runs the DDL when the
+# database's user_version is older, so a normal start does a single PRAGMA.
+SCHEMA_VERSION = 6
+
+# Prepared statements kept per connection; the repositories below reuse a few dozen
+STATEMENT_CACHE_SIZE = 256
+
+# Storage modes (main.py --storage):
+#   disk   - work on the database file directly (default)
+#   memory - load the file into a :memory: database and write it back with the
+#            sqlite backup API every FLUSH_INTERVAL_SECONDS and at exit
+#   tmpfs  - the same, but the working copy is a file in RAM-backed TMPFS_DIR, so
+#            grading worker processes and the outbox thread can open it too
+# The archive database is worked on as a TMPFS_DIR copy in both RAM modes.
+STORAGE_MODES = ("disk", "memory", "tmpfs")
+TMPFS_DIR = "/dev/shm"
+FLUSH_INTERVAL_SECONDS = 60
+
+conn = None
+cursor = None
+students_repo = None
+grades_repo = None
+releases_repo = None
+outbox_repo = None
+
+# File other connections and worker processes open; None for :memory:
+working_db_file = DB_FILE
+# Files the RAM copies are flushed to; None in disk mode
+durable_db_file = None
+durable_archive_file = None
+
+
+def open_database(db_file=DB_FILE, storage="disk"):
+    """Connect to the database and bring its schema up to date"""
+    global conn, cursor, students_repo, grades_repo, releases_repo, outbox_repo
+    global working_db_file, durable_db_file, durable_archive_file, archive_db_file
+    global archive_attached, archived_years_cache, archived_years_data_version
+    # The archive lives next to the database it belongs to
+    archive_file = os.path.join(os.path.dirname(db_file), ARCHIVE_DB_FILE)
+    if storage == "disk":
+        conn = sqlite3.connect(db_file, cached_statements=STATEMENT_CACHE_SIZE)
+        working_db_file = db_file
+        archive_db_file = archive_file
+    else:
+        durable_db_file = db_file
+        durable_archive_file = archive_file
+        archive_db_file = tmpfs_copy(archive_file)
+        if storage == "memory":
+            conn = sqlite3.connect(":memory:", cached_statements=STATEMENT_CACHE_SIZE)
+            working_db_file = None
+            if os.path.exists(db_file):
+                copy_database(db_file, conn)
+        else:
+            working_db_file = tmpfs_copy(db_file)
+            conn = sqlite3.connect(working_db_file, cached_statements=STATEMENT_CACHE_SIZE)
+        atexit.register(close_database)
+    cursor = conn.cursor()
+    students_repo = StudentRepo(conn)
+    grades_repo = GradeRepo(conn)
+    releases_repo = ReleaseRepo(conn)
+    outbox_repo = OutboxRepo(conn)
+    cursor.execute("PRAGMA user_version")
+    if cursor.fetchone()[0] < SCHEMA_VERSION:
+        create_schema()
+
+    # Attaches the archive if years are archived
+    archive_attached = False
+    archived_years_cache = None
+    archived_years_data_version = None
+    archived_school_years()
+
+
+def copy_database(src_file, dst):
+    """Copy a database file into connection ``dst`` with the backup API"""
+    src = sqlite3.connect(src_file)
+    try:
+        src.backup(dst)
+    finally:
+        src.close()
+
+
+def tmpfs_copy(db_file):
+    """Working copy of ``db_file`` in TMPFS_DIR (an empty database if the file does not exist yet)"""
+    import tempfile
+
+    directory = TMPFS_DIR if os.path.isdir(TMPFS_DIR) else tempfile.gettempdir()
+    path = os.path.join(directory, f"sis-{os.getpid()}-{os.path.basename(db_file)}")
+    dst = sqlite3.connect(path)
+    try:
+        if os.path.exists(db_file):
+            copy_database(db_file, dst)
+    finally:
+        dst.close()
+    return path
+
+
+def flush_database():
+    """Write the RAM working copy back to disk; False if there is none or a transaction is open"""
+    if durable_db_file is None or conn.in_transaction:
+        return False
+    targets = [("main", durable_db_file)]
+    if archive_attached:
+        targets.append(("archive", durable_archive_file))
+    for name, path in targets:
+        dst = sqlite3.connect(path)
+        try:
+            conn.backup(dst, name=name)
+            if name == "main":
+                # A :memory: source leaves a new file in rollback-journal mode, and
+                # create_schema will not run on it again to switch it to WAL
+                dst.execute("PRAGMA journal_mode=WAL")
+        finally:
+            dst.close()
+    return True
+
+
+def close_database():
+    """Final flush at exit; uncommitted changes are dropped, as they would be on disk"""
+    global durable_db_file
+    if durable_db_file is None:
+        return
+    if conn.in_transaction:
+        conn.rollback()
+    flush_database()
+    durable_db_file = None
+    conn.close()
+    for path in (working_db_file, archive_db_file):
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            if path and os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+class DatabaseFlusher:
+    """Flushes the RAM working copy to disk on a Tk timer"""
+
+    def __init__(self, widget, interval_seconds=None):
+        self.widget = widget
+        self.interval_ms = int((interval_seconds or FLUSH_INTERVAL_SECONDS) * 1000)
+        self.widget.after(self.interval_ms, self.tick)
+
+    def tick(self):
+        try:
+            if not self.widget.winfo_exists():
+                return
+        except tk.TclError:
+            return
+        flush_database()
+        self.widget.after(self.interval_ms, self.tick)
+
+
+def create_schema():
+    # WAL lets students read published grades while an admin is writing
+    cursor.execute("PRAGMA journal_mode=WAL")
+
+    # Create students table with password
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS students (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_number TEXT UNIQUE,
+        first_name TEXT,
+        middle_name TEXT,
+        last_name TEXT,
+        course TEXT,
+        password TEXT
+    )
+    """)
+
+    # Create grades table with semester column and units
+    # prelim, midterm and finals are the period grades; final_grade is computed by the grading policy
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS grades (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INTEGER,
+        subject_code TEXT,
+        subject_desc TEXT,
+        units INTEGER,
+        semester TEXT,
+        prelim TEXT,
+        midterm TEXT,
+        final_grade TEXT,
+        finals TEXT,
+        version INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY(student_id) REFERENCES students(id)
+    )
+    """)
+
+    # Databases created before the grading policy have no finals column:
+    # the final grade that was typed in becomes the finals period grade
+    cursor.execute("PRAGMA table_info(grades)")
+    if "finals" not in [col[1] for col in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE grades ADD COLUMN finals TEXT")
+        cursor.execute("UPDATE grades SET finals = final_grade")
+
+    # Bumped on every write so edit dialogs can detect changes made since they opened
+    cursor.execute("PRAGMA table_info(grades)")
+    if "version" not in [col[1] for col in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE grades ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+
+    # One grade row per student, semester and subject. Lookups by student and
+    # semester (the hot path of both portals) use its prefix, and grade sheet
+    # imports upsert on it. Older databases can hold duplicates: the most edited
+    # (then newest) row stays, the others are moved to duplicate_grades for review.
+    cursor.execute("CREATE TABLE IF NOT EXISTS duplicate_grades AS SELECT * FROM grades WHERE 0")
+    cursor.execute("""
+    INSERT INTO duplicate_grades SELECT * FROM grades WHERE id IN (
+        SELECT id FROM (
+            SELECT id, ROW_NUMBER() OVER (PARTITION BY student_id, semester, subject_code
+                                          ORDER BY version DESC, id DESC) AS newest
+            FROM grades)
+        WHERE newest > 1)
+    """)
+    duplicates = cursor.rowcount
+    if duplicates:
+        cursor.execute("DELETE FROM grades WHERE id IN (SELECT id FROM duplicate_grades)")
+        print(f"Schema upgrade: moved {duplicates} duplicate grade rows to the duplicate_grades table",
+              file=sys.stderr)
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_grades_student_semester_subject "
+                   "ON grades (student_id, semester, subject_code)")
+    cursor.execute("DROP INDEX IF EXISTS idx_grades_student_semester")
+    # Class rosters: every student taking one subject in one semester
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_grades_semester_subject ON grades (semester, subject_code)")
+
+    # School years whose grades were moved to the archive database
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS archived_years (
+        school_year TEXT PRIMARY KEY,
+        archived_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+    # Published grade releases: immutable, denormalized snapshots of one semester.
+    # The student portal only reads the latest release of each semester.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS grade_releases (
+        version INTEGER PRIMARY KEY AUTOINCREMENT,
+        semester TEXT,
+        published_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_grade_releases_semester ON grade_releases (semester, version)")
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS released_grades (
+        version INTEGER,
+        student_id INTEGER,
+        grade_id INTEGER,
+        subject_code TEXT,
+        subject_desc TEXT,
+        units INTEGER,
+        prelim TEXT,
+        midterm TEXT,
+        finals TEXT,
+        final_grade TEXT,
+        PRIMARY KEY (version, student_id, grade_id)
+    ) WITHOUT ROWID
+    """)
+
+    # Precomputed GWAs per student and release; total_gwa covers every semester's latest release
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS released_gwa (
+        version INTEGER,
+        student_id INTEGER,
+        total_units INTEGER,
+        prelim_gwa REAL,
+        midterm_gwa REAL,
+        finals_gwa REAL,
+        semester_gwa REAL,
+        total_gwa REAL,
+        PRIMARY KEY (version, student_id)
+    ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_released_gwa_student ON released_gwa (student_id, version)")
+
+    # Sorting and filtering of the admin student list is done by SQL on these indexes
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_students_last_name ON students (last_name, first_name)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_students_course ON students (course, last_name, first_name)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_grades_final_numeric ON grades (CAST(final_grade AS REAL), student_id)")
+
+    # Change sequence read by open windows to refresh only what changed.
+    # NULL student_id / semester means "every student" / "every semester".
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS change_log (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT,
+        student_id INTEGER,
+        semester TEXT,
+        changed_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+    # History of maintenance runs with the database size at the time
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS maintenance_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        task TEXT,
+        ran_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        duration_ms REAL,
+        size_bytes INTEGER,
+        page_count INTEGER,
+        freelist_count INTEGER,
+        result TEXT
+    )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_maintenance_log_task ON maintenance_log (task, ran_at)")
+
+    # Outbox of grade changes for other campus systems (see outbox.py).
+    # AUTOINCREMENT keeps seq unique after delivered events are pruned.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS grade_events (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        grade_id INTEGER NOT NULL,
+        student_id INTEGER NOT NULL,
+        student_number TEXT,
+        subject_code TEXT,
+        semester TEXT,
+        prelim TEXT,
+        midterm TEXT,
+        finals TEXT,
+        final_grade TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS outbox_checkpoints (
+        sink TEXT PRIMARY KEY,
+        last_seq INTEGER NOT NULL,
+        delivered_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+    # Databases from before grade releases start with everything already published
+    cursor.execute("SELECT COUNT(*) FROM grade_releases")
+    if cursor.fetchone()[0] == 0:
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM grades)")
+        if cursor.fetchone()[0]:
+            for sem in semester_subjects.keys():
+                publish_grades(sem)
+
+    cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.commit()
+
+
+# -------- GRADING POLICY --------
+# Weights, rounding and the failing threshold live in grading_policy.json (see grading.py)
+GRADING_POLICY_FILE = "grading_policy.json"
+grading_policy = GradingPolicy()
+
+
+def load_grading_policy():
+    global grading_policy
+    grading_policy = GradingPolicy.load(GRADING_POLICY_FILE)
+
 
 # -------- SUBJECTS BY SEMESTER --------
 semester_subjects = {
@@ -97,22 +422,367 @@ current_student_id = None
 student_info = None
 
 
-# -------- GRADE GENERATION --------
-def generate_realistic_grades(student_profile):
-    """Generate grades ONLY from: 1.00, 1.25, 1.50, 1.75, 2.00, 2.25, 2.50, 2.75"""
-    prelim = random.choice(GRADE_VALUES)
-    midterm = random.choice(GRADE_VALUES)
-    final = random.choice(GRADE_VALUES)
-    return prelim, midterm, final
-
-
-def generate_subject_grades(overall_profile):
-    """Generate grades for all subjects"""
+# -------- ARCHIVE DATABASE --------
+# Closed school years are moved out of the hot grades table into a separate
+# SQLite file. It is ATTACHed once some year has been archived, so databases
+# without archived years never open it.
+ARCHIVE_DB_FILE = "sis_archive.db"
+# Path actually ATTACHed; set by open_database
+archive_db_file = ARCHIVE_DB_FILE
+
+
+def school_year_of(semester):
+    """'SY 2024-2025, 1st Semester' -> 'SY 2024-2025'"""
+    return semester.split(",")[0].strip()
+
+
+CURRENT_SCHOOL_YEAR = school_year_of(list(semester_subjects.keys())[-1])
+
+archive_attached = False
+archived_years_cache = None
+# PRAGMA data_version when archived_years_cache was read
+archived_years_data_version = None
+
+
+def archived_school_years():
+    """School years in the archive, read again whenever another connection has committed
+
+    Another process may archive a year while this one runs. The archive is
+    attached as soon as a year is seen (when no transaction is open; until then
+    queries on archived semesters fail instead of reading main.grades).
+    """
+    global archived_years_cache, archived_years_data_version
+    version = conn.execute("PRAGMA data_version").fetchone()[0]
+    if archived_years_cache is None or version != archived_years_data_version:
+        cursor.execute("SELECT school_year FROM archived_years")
+        archived_years_cache = {row[0] for row in cursor.fetchall()}
+        archived_years_data_version = version
+    if archived_years_cache and not archive_attached and not conn.in_transaction:
+        attach_archive()
+    return archived_years_cache
+
+
+def attach_archive():
+    """ATTACH the archive file (once) and point the all_grades view at both databases
+
+    Must be called outside a transaction (ATTACH is not allowed inside one); it
+    commits its own schema changes to the archive. archived_school_years does it
+    once a year is archived, archive_school_year before the first year is moved.
+    """
+    global archive_attached
+    if archive_attached:
+        return
+    cursor.execute("ATTACH DATABASE ? AS archive", (archive_db_file,))
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS archive.grades (
+        id INTEGER PRIMARY KEY,
+        student_id INTEGER,
+        subject_code TEXT,
+        subject_desc TEXT,
+        units INTEGER,
+        semester TEXT,
+        prelim TEXT,
+        midterm TEXT,
+        final_grade TEXT,
+        finals TEXT,
+        version INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    cursor.execute("PRAGMA archive.table_info(grades)")
+    columns = [col[1] for col in cursor.fetchall()]
+    if "finals" not in columns:
+        cursor.execute("ALTER TABLE archive.grades ADD COLUMN finals TEXT")
+        cursor.execute("UPDATE archive.grades SET finals = final_grade")
+    if "version" not in columns:
+        cursor.execute("ALTER TABLE archive.grades ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("CREATE INDEX IF NOT EXISTS archive.idx_grades_student_semester ON grades (student_id, semester)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS archive.idx_grades_semester_subject ON grades (semester, subject_code)")
+    cursor.execute("DROP VIEW IF EXISTS temp.all_grades")
+    cursor.execute("""
+    CREATE TEMP VIEW all_grades AS
+    SELECT * FROM main.grades
+    UNION ALL
+    SELECT * FROM archive.grades
+    """)
+    conn.commit()
+    archive_attached = True
+
+
+def open_semesters():
+    """Semesters whose school year has not been archived"""
+    archived = archived_school_years()
+    return [sem for sem in semester_subjects if school_year_of(sem) not in archived]
+
+
+def grades_table(semester=None):
+    """Table to query for one semester's grades, or for every semester when None"""
+    # The archive is attached whenever a year is archived (see open_database)
+    archived = archived_school_years()
+    if semester is None:
+        return "all_grades" if archived else "grades"
+    if school_year_of(semester) in archived:
+        return "archive.grades"
+    return "grades"
+
+
+GRADE_COPY_COLUMNS = ("student_id", "subject_code", "subject_desc", "units", "semester",
+                      "prelim", "midterm", "final_grade", "finals", "version")
+
+# Copies keep their main.grades id. A copy left by an interrupted run is
+# refreshed; an archive row with the same id but another key is left alone.
+ARCHIVE_COPY_SQL = f"""
+INSERT INTO archive.grades (id, {", ".join(GRADE_COPY_COLUMNS)})
+SELECT id, {", ".join(GRADE_COPY_COLUMNS)} FROM main.grades WHERE semester LIKE ? || ',%'
+ON CONFLICT (id) DO UPDATE SET {", ".join(f"{col} = excluded.{col}" for col in GRADE_COPY_COLUMNS)}
+WHERE student_id = excluded.student_id AND semester = excluded.semester AND subject_code = excluded.subject_code
+"""
+
+ARCHIVE_DELETE_SQL = f"""
+DELETE FROM main.grades WHERE semester LIKE ? || ',%' AND EXISTS (
+    SELECT 1 FROM archive.grades a WHERE a.id = main.grades.id AND
+    {" AND ".join(f"a.{col} IS main.grades.{col}" for col in GRADE_COPY_COLUMNS)})
+"""
+
+
+def archive_school_year(school_year):
+    """Move every grade of a closed school year into the archive database"""
+    if school_year == CURRENT_SCHOOL_YEAR:
+        raise ValueError("The current school year cannot be archived.")
+    attach_archive()
+    # With the main database in WAL mode SQLite does not commit across attached
+    # files atomically, so copy first and delete in a second transaction. A crash
+    # in between leaves the rows in both files; running this again refreshes the
+    # copies and finishes the move.
+    try:
+        cursor.execute(ARCHIVE_COPY_SQL, (school_year,))
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    try:
+        # Only rows whose copy in the archive is identical are removed
+        cursor.execute(ARCHIVE_DELETE_SQL, (school_year,))
+        moved = cursor.rowcount
+        cursor.execute("SELECT COUNT(*) FROM main.grades WHERE semester LIKE ? || ',%'", (school_year,))
+        left = cursor.fetchone()[0]
+        if left:
+            # An archive row with the same id but another grade, or an edit made
+            # since the copy: keep everything in main rather than lose a grade
+            raise sqlite3.IntegrityError(f"{left} grade(s) of {school_year} could not be copied to the archive")
+        cursor.execute("INSERT OR IGNORE INTO archived_years (school_year) VALUES (?)", (school_year,))
+        record_change("grades")
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    archived_school_years().add(school_year)
+    return moved
+
+
+def archive_closed_years():
+    """Archive every school year before the current one; returns {school_year: rows moved}"""
+    archived = archived_school_years()
+    moved = {}
+    for sem in semester_subjects.keys():
+        school_year = school_year_of(sem)
+        if school_year != CURRENT_SCHOOL_YEAR and school_year not in archived and school_year not in moved:
+            moved[school_year] = archive_school_year(school_year)
+    return moved
+
+
+# -------- LIVE REFRESH --------
+# Writers call record_change() inside their transaction; every open window has a
+# ChangeWatcher that polls PRAGMA data_version and reloads only the views whose
+# student/semester was touched.
+CHANGE_LOG_SIZE = 1000
+REFRESH_INTERVAL_MS = 1000
+
+change_watcher = None
+local_changes_pending = False
+
+
+def record_change(kind, student_id=None, semester=None):
+    """Log a change ('students', 'grades' or 'release'); the caller commits"""
+    global local_changes_pending
+    cursor.execute("INSERT INTO change_log (kind, student_id, semester) VALUES (?,?,?)",
+                   (kind, student_id, semester))
+    cursor.execute("DELETE FROM change_log WHERE seq <= ?", (cursor.lastrowid - CHANGE_LOG_SIZE,))
+    # data_version only moves for commits made by other connections
+    local_changes_pending = True
+
+
+class ChangeWatcher:
+    """Polls the database on a Tk timer and calls the views a change affects"""
+
+    def __init__(self, widget, interval_ms=REFRESH_INTERVAL_MS):
+        self.widget = widget
+        self.interval_ms = interval_ms
+        self.subscribers = {}
+        self.next_token = 0
+        self.data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        self.last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+        self.widget.after(self.interval_ms, self.poll)
+
+    def subscribe(self, callback, kinds, student_id=None, semester=None):
+        """Call ``callback()`` when a change of one of ``kinds`` touches this student/semester"""
+        self.next_token += 1
+        self.subscribers[self.next_token] = (callback, set(kinds), student_id, semester)
+        return self.next_token
+
+    def unsubscribe(self, token):
+        self.subscribers.pop(token, None)
+
+    def poll(self):
+        global local_changes_pending
+        try:
+            if not self.widget.winfo_exists():
+                return
+        except tk.TclError:
+            return
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self.data_version or local_changes_pending:
+            self.data_version = version
+            local_changes_pending = False
+            self.dispatch()
+        self.widget.after(self.interval_ms, self.poll)
+
+    def dispatch(self):
+        first_seq = conn.execute("SELECT MIN(seq) FROM change_log").fetchone()[0]
+        changes = conn.execute("SELECT seq, kind, student_id, semester FROM change_log WHERE seq > ? ORDER BY seq",
+                               (self.last_seq,)).fetchall()
+        # Fell behind the pruned log: refresh everything
+        missed = first_seq is not None and first_seq > self.last_seq + 1
+        if changes:
+            self.last_seq = changes[-1][0]
+
+        for token, (callback, kinds, student_id, semester) in list(self.subscribers.items()):
+            if token not in self.subscribers:
+                continue
+            if missed or any(kind in kinds
+                             and (changed_student is None or student_id is None or changed_student == student_id)
+                             and (changed_sem is None or semester is None or changed_sem == semester)
+                             for _, kind, changed_student, changed_sem in changes):
+                try:
+                    callback()
+                except tk.TclError:
+                    # The view was closed
+                    self.unsubscribe(token)
+
+
+# -------- GRADE RELEASES --------
+# Admins edit the live grades tables; students only ever see a published release.
+# Publishing happens in one transaction, so the switch to a new version is atomic.
+RELEASES_TO_KEEP = 3
+
+
+def latest_release(semester):
+    """Latest published version of a semester, or None if it was never published"""
+    return releases_repo.latest_version(semester)
+
+
+def published_semesters():
+    published = releases_repo.semesters()
+    return [sem for sem in semester_subjects.keys() if sem in published]
+
+
+def publish_grades(semester):
+    """Freeze the semester's current grades into a new release; returns its version"""
+    if conn.in_transaction:
+        conn.commit()
+    table = grades_table(semester)
+    try:
+        version = releases_repo.create(semester, table)
+
+        # Semester GWAs from this release
+        gwa_rows = {}
+        for student_id, group in groupby(releases_repo.release_rows(version), key=lambda r: r[0]):
+            group = list(group)
+            prelim_gwa, total_units = weighted_average((r[1], r[2]) for r in group)
+            midterm_gwa, _ = weighted_average((r[1], r[3]) for r in group)
+            finals_gwa, _ = weighted_average((r[1], r[4]) for r in group)
+            semester_gwa, _ = weighted_average((r[1], r[5]) for r in group)
+            gwa_rows[student_id] = [version, student_id, total_units, prelim_gwa, midterm_gwa, finals_gwa,
+                                    semester_gwa, None]
+
+        # Total GWAs across the latest release of every semester (including this one)
+        for student_id, group in groupby(releases_repo.latest_final_grades(), key=lambda r: r[0]):
+            if student_id in gwa_rows:
+                gwa_rows[student_id][7], _ = weighted_average((r[1], r[2]) for r in group)
+
+        releases_repo.insert_gwa(gwa_rows.values())
+        record_change("release", semester=semester)
+
+        # Drop releases that no reader can still be looking at
+        releases_repo.prune(semester, RELEASES_TO_KEEP)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return version
+
+
+# -------- PASSWORDS --------
+def hash_password(password):
+    import hashlib
+    return hashlib.sha256(password.encode()).hexdigest()
 
-    def get_subject_profile(subject_code, base_profile):
-        return base_profile
 
-    return get_subject_profile
+# -------- GRADE GENERATION --------
+# Set a seed to generate the same students and grades on every run
+SIMULATION_SEED = None
+grade_simulator = None
+
+
+def get_grade_simulator():
+    global grade_simulator
+    if grade_simulator is None:
+        from grade_simulation import make_grade_simulator
+        grade_simulator = make_grade_simulator(GRADE_VALUES, seed=SIMULATION_SEED)
+    return grade_simulator
+
+
+def generate_subject_grades(student_ids, semesters=None, overall_profile=None):
+    """Generate grade rows for all subjects of the given semesters (default: every open semester)"""
+    if semesters is None:
+        semesters = open_semesters()
+    profiles = [overall_profile] * len(student_ids) if overall_profile else None
+    return get_grade_simulator().grade_rows(student_ids, {sem: semester_subjects[sem] for sem in semesters}, profiles)
+
+
+def insert_grade_rows(rows, publish_events=True):
+    """Insert (student_id, code, desc, units, semester, prelim, midterm, finals) rows
+    with the final grade from the grading policy
+
+    Archived school years are closed: a row for one raises ValueError. New rows
+    only go into main.grades, so every grade id comes from its sequence.
+    With publish_events, a grade event per row is written to the outbox in the same transaction.
+    """
+    archived = archived_school_years()
+    table_rows = []
+    for row in rows:
+        if school_year_of(row[4]) in archived:
+            raise ValueError(f"{row[4]} is archived; its grades cannot be added to.")
+        pre, mid, fin = row[5:8]
+        table_rows.append((*row[:8], grading_policy.final_grade(pre, mid, fin)))
+    grades_repo.insert_many(table_rows)
+    if publish_events:
+        outbox_repo.record_inserts([(row[0], row[4], row[1]) for row in table_rows])
+
+
+def seed_sample_students(count, password="password", course="B.S. INFORMATION TECHNOLOGY", batch_size=5000):
+    """Insert simulated students with grades for every semester"""
+    hashed_password = hash_password(password)
+    next_id = students_repo.max_id() + 1
+
+    for batch_start in range(next_id, next_id + count, batch_size):
+        ids = list(range(batch_start, min(batch_start + batch_size, next_id + count)))
+        students_repo.insert_many(
+            [(sid, str(1000000 + sid), f"Student{sid}", "M", "Last", course, hashed_password) for sid in ids])
+        # Simulated students are not real records; keep them out of the outbox
+        insert_grade_rows(generate_subject_grades(ids), publish_events=False)
+        record_change("students")
+        record_change("grades")
+        conn.commit()
 
 
 # -------- MODERN BUTTON CLASS --------
@@ -201,20 +871,17 @@ def add_student_window():
             messagebox.showerror("Error", "Please fill in all required fields (*)")
             return
 
-        hashed_password = hashlib.sha256(password.encode()).hexdigest()
+        hashed_password = hash_password(password)
+        # Read before the insert opens a transaction, so a year archived by another
+        # process is seen (and the archive attached) first
+        semesters = open_semesters()
         try:
-            cursor.execute(
-                "INSERT INTO students (student_number, first_name, middle_name, last_name, course, password) VALUES (?,?,?,?,?,?)",
-                (student_number, first, middle, last, course, hashed_password))
-            sid = cursor.lastrowid
-
-            # Generate grades for all semesters
-            for sem, subjects in semester_subjects.items():
-                for code, desc, units in subjects:
-                    pre, mid, fin = generate_realistic_grades(None)
-                    cursor.execute(
-                        "INSERT INTO grades (student_id, subject_code, subject_desc, units, semester, prelim, midterm, final_grade) VALUES (?,?,?,?,?,?,?,?)",
-                        (sid, code, desc, units, sem, pre, mid, fin))
+            sid = students_repo.insert(student_number, first, middle, last, course, hashed_password)
+
+            # Generate grades for every open semester
+            insert_grade_rows(generate_subject_grades([sid], semesters))
+            record_change("students", sid)
+            record_change("grades", sid)
             conn.commit()
             messagebox.showinfo("Success",
                                 f"Student added successfully!\n\nStudent Number: {student_number}\nPassword: {password}")
@@ -230,7 +897,7 @@ def add_student_window():
 
 
 # -------- LOGIN WINDOW --------
-def login():
+def login(exit_after_first_window=False):
     login_win = tk.Tk()
     login_win.title("Student Information System - Login")
     login_win.state('zoomed')
@@ -249,6 +916,7 @@ def login():
     logo_container.pack(pady=(80, 0))
 
     try:
+        from PIL import Image, ImageTk
         logo_img = Image.open("adulogo.png").resize((110, 110), Image.Resampling.LANCZOS)
         logo_photo = ImageTk.PhotoImage(logo_img)
         logo_label = tk.Label(logo_container, image=logo_photo, bg="#e8f0fe")
@@ -303,26 +971,22 @@ def login():
     def authenticate_student():
         snum = student_num_entry.get()
         pwd = student_pass_entry.get()
-        hashed_pwd = hashlib.sha256(pwd.encode()).hexdigest()
-        cursor.execute(
-            "SELECT id, first_name, middle_name, last_name, course FROM students WHERE student_number=? AND password=?",
-            (snum, hashed_pwd))
-        row = cursor.fetchone()
-        if row:
+        hashed_pwd = hash_password(pwd)
+        student = students_repo.authenticate(snum, hashed_pwd)
+        if student:
             global current_student_id, student_info
-            current_student_id = row[0]
-            student_info = row[1:]
-
-            # Check if grades exist, if not generate grades
-            for sem in semester_subjects.keys():
-                cursor.execute("SELECT COUNT(*) FROM grades WHERE student_id=? AND semester=?",
-                               (current_student_id, sem))
-                if cursor.fetchone()[0] == 0:
-                    for code, desc, units in semester_subjects[sem]:
-                        pre, mid, fin = generate_realistic_grades(None)
-                        cursor.execute(
-                            "INSERT INTO grades (student_id, subject_code, subject_desc, units, semester, prelim, midterm, final_grade) VALUES (?,?,?,?,?,?,?,?)",
-                            (current_student_id, code, desc, units, sem, pre, mid, fin))
+            current_student_id = student.id
+            student_info = student
+
+            # Check if grades exist, if not generate grades (archived years are closed)
+            missing = []
+            for sem in open_semesters():
+                if grades_repo.count_for(current_student_id, sem) == 0:
+                    missing.append(sem)
+            if missing:
+                insert_grade_rows(generate_subject_grades([current_student_id], missing))
+                for sem in missing:
+                    record_change("grades", current_student_id, sem)
             conn.commit()
             login_win.destroy()
             main_app()
@@ -388,6 +1052,12 @@ def login():
                  relief="flat", cursor="hand2", activebackground="#1b5e20",
                  width=20).pack(ipady=6)
 
+    if exit_after_first_window:
+        login_win.wait_visibility()
+        login_win.update()
+        login_win.destroy()
+        return
+
     login_win.mainloop()
 
 
@@ -404,6 +1074,7 @@ def main_app():
     header.pack_propagate(False)
 
     try:
+        from PIL import Image, ImageTk
         logo_img = Image.open("adulogo.png").resize((80, 80), Image.Resampling.LANCZOS)
         logo_photo = ImageTk.PhotoImage(logo_img)
         logo_label = tk.Label(header, image=logo_photo, bg="#1976d2")
@@ -418,8 +1089,7 @@ def main_app():
     tk.Label(header_text, text="Student Grade Portal", font=("Segoe UI", 30, "bold"),
              fg="white", bg="#1976d2").pack(anchor="w")
 
-    full_name = f"{student_info[0]} {student_info[1]} {student_info[2]}" if student_info[
-        1] else f"{student_info[0]} {student_info[2]}"
+    full_name = student_info.full_name
     tk.Label(header_text, text=f"Welcome, {full_name}", font=("Segoe UI", 13),
              fg="#bbdefb", bg="#1976d2").pack(anchor="w")
 
@@ -452,7 +1122,7 @@ def main_app():
 
     tk.Label(info_grid, text="Course:", font=("Segoe UI", 12, "bold"),
              bg="white", fg="#616161").grid(row=1, column=0, sticky="w", pady=8, padx=(0, 15))
-    tk.Label(info_grid, text=student_info[3], font=("Segoe UI", 12),
+    tk.Label(info_grid, text=student_info.course, font=("Segoe UI", 12),
              bg="white", fg="#212529").grid(row=1, column=1, sticky="w", pady=8)
 
     # Grades card
@@ -473,12 +1143,15 @@ def main_app():
     semester_style = ttk.Style()
     semester_style.configure("Custom.TCombobox", padding=5)
 
+    # Students only see semesters whose grades have been published
+    released = published_semesters()
     semester_dropdown = ttk.Combobox(selector_frame, textvariable=semester_var,
-                                     values=list(semester_subjects.keys()),
+                                     values=released,
                                      state="readonly", font=("Segoe UI", 11),
                                      width=40, style="Custom.TCombobox")
     semester_dropdown.pack(side="left")
-    semester_dropdown.current(0)
+    if released:
+        semester_dropdown.current(0)
 
     # Grades table
     tree_frame = tk.Frame(grades_inner, bg="white")
@@ -499,13 +1172,14 @@ def main_app():
                     relief="flat")
     style.map('Treeview', background=[('selected', '#1976d2')])
 
-    tree = ttk.Treeview(tree_frame, columns=("Code", "Description", "Units", "Prelim", "Midterm", "Final"),
+    tree = ttk.Treeview(tree_frame, columns=("Code", "Description", "Units", "Prelim", "Midterm", "Finals", "Final"),
                         show="headings", height=13)
     tree.heading("Code", text="Subject Code")
     tree.heading("Description", text="Subject Description")
     tree.heading("Units", text="Units")
     tree.heading("Prelim", text="Prelim")
     tree.heading("Midterm", text="Midterm")
+    tree.heading("Finals", text="Finals")
     tree.heading("Final", text="Final Grade")
 
     tree.column("Code", width=130, anchor="center")
@@ -513,6 +1187,7 @@ def main_app():
     tree.column("Units", width=80, anchor="center")
     tree.column("Prelim", width=100, anchor="center")
     tree.column("Midterm", width=100, anchor="center")
+    tree.column("Finals", width=100, anchor="center")
     tree.column("Final", width=120, anchor="center")
 
     scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=tree.yview)
@@ -547,80 +1222,41 @@ def main_app():
             tree.delete(row)
 
         selected_semester = semester_var.get()
-        cursor.execute(
-            "SELECT subject_code, subject_desc, units, prelim, midterm, final_grade FROM grades WHERE student_id=? AND semester=?",
-            (current_student_id, selected_semester))
-        rows = cursor.fetchall()
-
-        prelim_weighted = 0
-        midterm_weighted = 0
-        final_weighted = 0
-        total_units = 0
-
-        for row in rows:
-            tree.insert("", "end", values=row)
+        version = latest_release(selected_semester)
+        if version is None:
+            period_gwa_label.config(text="Grades for this semester have not been released yet.")
+            semester_gwa_label.config(text="📊 Semester GWA (Final Grades): N/A")
+            total_gwa_label.config(text="🎓 Total GWA (All Semesters): N/A")
+            return
 
-            code, desc, units, pre, mid, fin = row
-            try:
-                prelim_grade = float(pre)
-                midterm_grade = float(mid)
-                final_grade = float(fin)
-                units_int = int(units)
-
-                prelim_weighted += prelim_grade * units_int
-                midterm_weighted += midterm_grade * units_int
-                final_weighted += final_grade * units_int
-                total_units += units_int
-            except ValueError:
-                pass
+        for g in releases_repo.grades(version, current_student_id):
+            tree.insert("", "end", values=(g.subject_code, g.subject_desc, g.units,
+                                           g.prelim, g.midterm, g.finals, g.final_grade))
 
-        if total_units > 0:
-            prelim_gwa = round(prelim_weighted / total_units, 2)
-            midterm_gwa = round(midterm_weighted / total_units, 2)
-            final_gwa = round(final_weighted / total_units, 2)
+        gwa = releases_repo.gwa(version, current_student_id)
 
+        if gwa and gwa.total_units > 0:
+            semester_gwa = gwa.semester_gwa
             tree.insert("", "end",
-                        values=("—", "General Weighted Average:", total_units, prelim_gwa, midterm_gwa, final_gwa),
+                        values=("—", "General Weighted Average:", gwa.total_units, gwa.prelim_gwa, gwa.midterm_gwa,
+                                gwa.finals_gwa, semester_gwa if semester_gwa is not None else "—"),
                         tags=("total_gwa",))
 
             period_gwa_label.config(
-                text=f"General Weighted Average:     Prelim: {prelim_gwa}     Midterm: {midterm_gwa}     Finals: {final_gwa}")
+                text=f"General Weighted Average:     Prelim: {gwa.prelim_gwa}     Midterm: {gwa.midterm_gwa}     Finals: {gwa.finals_gwa}")
         else:
+            semester_gwa = None
             period_gwa_label.config(text="General Weighted Average:     N/A")
 
-        semester_weighted = 0
-        semester_units = 0
-        for code, desc, units, pre, mid, fin in rows:
-            try:
-                fin_grade = float(fin)
-                units_int = int(units)
-                semester_weighted += fin_grade * units_int
-                semester_units += units_int
-            except ValueError:
-                pass
-
-        if semester_units > 0:
-            semester_gwa = round(semester_weighted / semester_units, 2)
+        if semester_gwa is not None:
             semester_gwa_label.config(text=f"📊 Semester GWA (Final Grades): {semester_gwa}")
         else:
             semester_gwa_label.config(text=f"📊 Semester GWA (Final Grades): N/A")
 
-        cursor.execute("SELECT units, final_grade FROM grades WHERE student_id=?", (current_student_id,))
-        all_grades = cursor.fetchall()
+        # The most recent release this student appears in carries the freshest total
+        total_gwa = releases_repo.total_gwa(current_student_id)
 
-        total_weighted = 0
-        total_units_all = 0
-        for units, fin in all_grades:
-            try:
-                fin_grade = float(fin)
-                units_int = int(units)
-                total_weighted += fin_grade * units_int
-                total_units_all += units_int
-            except ValueError:
-                pass
-
-        if total_units_all > 0:
-            total_gwa = round(total_weighted / total_units_all, 2)
+        if total_gwa is not None:
             total_gwa_label.config(text=f"🎓 Total GWA (All Semesters): {total_gwa}")
         else:
             total_gwa_label.config(text=f"🎓 Total GWA (All Semesters): N/A")
@@ -628,9 +1264,39 @@ def main_app():
     semester_dropdown.bind("<<ComboboxSelected>>", lambda e: load_grades())
     load_grades()
 
+    # A newly published release replaces what the student is looking at
+    def refresh_release():
+        released = published_semesters()
+        semester_dropdown.config(values=released)
+        if released and semester_var.get() not in released:
+            semester_dropdown.current(0)
+        load_grades()
+
+    global change_watcher
+    change_watcher = ChangeWatcher(root)
+    change_watcher.subscribe(refresh_release, kinds=["release"])
+    MaintenanceScheduler(root)
+    if durable_db_file is not None:
+        DatabaseFlusher(root)
+
     root.mainloop()
 
 
+# -------- STUDENT LIST QUERIES --------
+STUDENTS_PAGE_SIZE = 100
+
+
+def query_students(sort_column="ID", descending=False, course=None, failing_only=False,
+                   limit=STUDENTS_PAGE_SIZE, offset=0):
+    """One page of the student list (Student rows) plus the number of matching students"""
+    failing_above = grading_policy.failing_threshold if failing_only else None
+    return students_repo.page(sort_column, descending, course, failing_above, limit, offset, grades_table())
+
+
+def student_courses():
+    return students_repo.courses()
+
+
 # -------- ADMIN APPLICATION --------
 def admin_app():
     root = tk.Tk()
@@ -666,21 +1332,17 @@ def admin_app():
     actions_frame = tk.Frame(content, bg="#f0f2f5")
     actions_frame.pack(fill="x", pady=(0, 20))
 
+    # Treeview item id -> Student row of the page being shown
+    shown_students = {}
+
     def view_edit_grades():
         selection = students_tree.selection()
         if not selection:
             messagebox.showwarning("No Selection", "Please select a student first.")
             return
 
-        item = students_tree.item(selection[0])
-        student_id = item['values'][0]
-
-        first_name = item['values'][2]
-        middle_name = item['values'][3]
-        last_name = item['values'][4]
-        student_name = f"{first_name} {middle_name} {last_name}" if middle_name else f"{first_name} {last_name}"
-
-        edit_grades_window(student_id, student_name)
+        student = shown_students[selection[0]]
+        edit_grades_window(student.id, student.full_name)
 
     def delete_student():
         selection = students_tree.selection()
@@ -688,21 +1350,24 @@ def admin_app():
             messagebox.showwarning("No Selection", "Please select a student to delete.")
             return
 
-        item = students_tree.item(selection[0])
-        student_id = item['values'][0]
-
-        first_name = item['values'][2]
-        middle_name = item['values'][3]
-        last_name = item['values'][4]
-        student_name = f"{first_name} {middle_name} {last_name}" if middle_name else f"{first_name} {last_name}"
+        student = shown_students[selection[0]]
+        student_id = student.id
 
         if messagebox.askyesno("Confirm Delete",
-                               f"Are you sure you want to delete {student_name}?\n\nThis action cannot be undone."):
-            cursor.execute("DELETE FROM grades WHERE student_id=?", (student_id,))
-            cursor.execute("DELETE FROM students WHERE id=?", (student_id,))
+                               f"Are you sure you want to delete {student.full_name}?\n\nThis action cannot be undone."):
+            tables = ["grades", "archive.grades"] if archived_school_years() else ["grades"]
+            for table in tables:
+                # The events read the student row, so they are written before anything is deleted
+                outbox_repo.record_student_deletes(student_id, table)
+                grades_repo.delete_for_student(student_id, table)
+            releases_repo.delete_student(student_id)
+            students_repo.delete(student_id)
+            record_change("students", student_id)
+            record_change("grades", student_id)
             conn.commit()
             messagebox.showinfo("Success", "Student deleted successfully.")
             students_tree.delete(selection[0])
+            shown_students.pop(selection[0], None)
 
     ModernButton(actions_frame, text="➕ Add New Student", command=add_student_window,
                  bg="#2e7d32", fg="white", font=("Segoe UI", 12, "bold"),
@@ -714,9 +1379,144 @@ def admin_app():
                  relief="flat", cursor="hand2", activebackground="#1565c0",
                  padx=25, pady=12).pack(side="left", padx=(0, 10))
 
+    ModernButton(actions_frame, text="📋 Class Roster", command=roster_window,
+                 bg="#1976d2", fg="white", font=("Segoe UI", 12, "bold"),
+                 relief="flat", cursor="hand2", activebackground="#1565c0",
+                 padx=25, pady=12).pack(side="left", padx=(0, 10))
+
+    def archive_years():
+        if not messagebox.askyesno("Confirm Archive",
+                                   f"Move all grades before {CURRENT_SCHOOL_YEAR} to the archive database?"):
+            return
+        try:
+            moved = archive_closed_years()
+        except sqlite3.Error as e:
+            messagebox.showerror("Error", f"Archiving failed: {e}")
+            return
+        if moved:
+            summary = "\n".join(f"{sy}: {n} grade rows" for sy, n in moved.items())
+            messagebox.showinfo("Success", f"Archived school years:\n\n{summary}")
+        else:
+            messagebox.showinfo("Archive", "There are no closed school years to archive.")
+
+    def apply_grading_policy():
+        global grading_policy
+        try:
+            policy = GradingPolicy.load(GRADING_POLICY_FILE)
+        except (ValueError, TypeError) as e:
+            messagebox.showerror("Error", f"Invalid grading policy in {GRADING_POLICY_FILE}:\n\n{e}")
+            return
+        if not messagebox.askyesno("Confirm Recompute",
+                                   "Recompute the final grades of every student?\n"
+                                   "Archived school years are left unchanged.\n\n"
+                                   f"Prelim {policy.prelim_weight:.0%} · Midterm {policy.midterm_weight:.0%} · "
+                                   f"Finals {policy.final_weight:.0%} · Failing above {policy.failing_threshold:.2f}"):
+            return
+        grading_policy = policy
+        changed = recompute_grades(conn, working_db_file, grading_policy)
+        if changed:
+            record_change("grades")
+            conn.commit()
+        messagebox.showinfo("Success", f"Grading policy applied.\n\n{changed} final grades changed.")
+
+    def publish_grades_dialog():
+        pub_dlg = tk.Toplevel(root)
+        pub_dlg.title("Publish Grades")
+        pub_dlg.geometry("460x330")
+        pub_dlg.configure(bg="#f8f9fa")
+        pub_dlg.resizable(False, False)
+        pub_dlg.transient(root)
+        pub_dlg.grab_set()
+
+        dlg_header = tk.Frame(pub_dlg, bg="#1976d2", height=65)
+        dlg_header.pack(fill="x")
+        dlg_header.pack_propagate(False)
+
+        tk.Label(dlg_header, text="📢 Publish Grades", font=("Segoe UI", 16, "bold"),
+                 bg="#1976d2", fg="white").pack(pady=16)
+
+        form = tk.Frame(pub_dlg, bg="#f8f9fa")
+        form.pack(fill="both", expand=True, padx=35, pady=25)
+
+        tk.Label(form, text="Semester", font=("Segoe UI", 9, "bold"),
+                 bg="#f8f9fa", fg="#616161").pack(anchor="w", pady=(0, 5))
+        pub_semester_var = tk.StringVar()
+        pub_dropdown = ttk.Combobox(form, textvariable=pub_semester_var,
+                                    values=list(semester_subjects.keys()),
+                                    state="readonly", font=("Segoe UI", 11))
+        pub_dropdown.pack(fill="x", ipady=6, pady=(0, 10))
+        pub_dropdown.current(len(semester_subjects) - 1)
+
+        status_label = tk.Label(form, text="", font=("Segoe UI", 9),
+                                bg="#f8f9fa", fg="#616161")
+        status_label.pack(anchor="w", pady=(0, 20))
+
+        def show_status():
+            last = releases_repo.latest(pub_semester_var.get())
+            if last:
+                status_label.config(text=f"Currently published: version {last[0]} ({last[1]} UTC)")
+            else:
+                status_label.config(text="Not published yet — students cannot see these grades.")
+
+        def publish():
+            semester = pub_semester_var.get()
+            try:
+                version = publish_grades(semester)
+            except sqlite3.Error as e:
+                messagebox.showerror("Error", f"Publishing failed: {e}", parent=pub_dlg)
+                return
+            messagebox.showinfo("Success", f"{semester} published as version {version}.", parent=pub_dlg)
+            pub_dlg.destroy()
+
+        pub_dropdown.bind("<<ComboboxSelected>>", lambda e: show_status())
+        show_status()
+
+        tk.Button(form, text="✓ Publish", command=publish,
+                  bg="#28a745", fg="white", font=("Segoe UI", 11, "bold"),
+                  relief="flat", cursor="hand2", activebackground="#218838",
+                  bd=0, pady=14).pack(fill="x")
+
+    def import_grade_sheet_dialog():
+        from tkinter import filedialog
+        from gradesheet import GradeSheetError
+
+        path = filedialog.askopenfilename(parent=root, title="Import Grade Sheet",
+                                          filetypes=[("CSV files", "*.csv"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            imported, rejected, report = import_grades(path)
+        except (OSError, GradeSheetError, sqlite3.Error) as e:
+            messagebox.showerror("Error", f"Import failed: {e}")
+            return
+        summary = f"Imported {imported} grades."
+        if rejected:
+            summary += f"\n\n{rejected} rows were rejected; see:\n{report}"
+        messagebox.showinfo("Import Grade Sheet", summary)
+
     ModernButton(actions_frame, text="🗑️ Delete Student", command=delete_student,
                  bg="#d32f2f", fg="white", font=("Segoe UI", 12, "bold"),
                  relief="flat", cursor="hand2", activebackground="#c62828",
+                 padx=25, pady=12).pack(side="left", padx=(0, 10))
+
+    ModernButton(actions_frame, text="🗄️ Archive Closed Years", command=archive_years,
+                 bg="#6c757d", fg="white", font=("Segoe UI", 12, "bold"),
+                 relief="flat", cursor="hand2", activebackground="#5a6268",
+                 padx=25, pady=12).pack(side="left", padx=(0, 10))
+
+    ModernButton(actions_frame, text="⚖️ Apply Grading Policy", command=apply_grading_policy,
+                 bg="#f57c00", fg="white", font=("Segoe UI", 12, "bold"),
+                 relief="flat", cursor="hand2", activebackground="#ef6c00",
+                 padx=25, pady=12).pack(side="left", padx=(0, 10))
+
+    ModernButton(actions_frame, text="📢 Publish Grades", command=publish_grades_dialog,
+                 bg="#1976d2", fg="white", font=("Segoe UI", 12, "bold"),
+                 relief="flat", cursor="hand2", activebackground="#1565c0",
+                 padx=25, pady=12).pack(side="left", padx=(0, 10))
+
+    ModernButton(actions_frame, text="📥 Import Grade Sheet", command=import_grade_sheet_dialog,
+                 bg="#00897b", fg="white", font=("Segoe UI", 12, "bold"),
+                 relief="flat", cursor="hand2", activebackground="#00796b",
                  padx=25, pady=12).pack(side="left")
 
     # Students list card
@@ -727,7 +1527,26 @@ def admin_app():
     students_inner.pack(fill="both", expand=True, padx=30, pady=25)
 
     tk.Label(students_inner, text="👥 All Students", font=("Segoe UI", 18, "bold"),
-             bg="white", fg="#212529").pack(anchor="w", pady=(0, 20))
+             bg="white", fg="#212529").pack(anchor="w", pady=(0, 15))
+
+    # Filter chips
+    filter_frame = tk.Frame(students_inner, bg="white")
+    filter_frame.pack(fill="x", pady=(0, 15))
+
+    tk.Label(filter_frame, text="Course:", font=("Segoe UI", 11, "bold"),
+             bg="white", fg="#616161").pack(side="left", padx=(0, 8))
+
+    ALL_COURSES = "All Courses"
+    course_filter_var = tk.StringVar(value=ALL_COURSES)
+    course_filter = ttk.Combobox(filter_frame, textvariable=course_filter_var,
+                                 values=[ALL_COURSES] + student_courses(),
+                                 state="readonly", font=("Segoe UI", 10), width=35)
+    course_filter.pack(side="left", padx=(0, 20))
+
+    failing_var = tk.BooleanVar(value=False)
+    tk.Checkbutton(filter_frame, text="Has failing grade", variable=failing_var,
+                   font=("Segoe UI", 11), bg="white", activebackground="white",
+                   command=lambda: show_page(0)).pack(side="left")
 
     # Students table
     tree_frame = tk.Frame(students_inner, bg="white")
@@ -744,6 +1563,26 @@ def admin_app():
     students_tree.heading("Last Name", text="Last Name")
     students_tree.heading("Course", text="Course")
 
+    # Clicking a sortable heading sorts by it; clicking it again reverses the order
+    sort_state = {"column": "ID", "descending": False, "page": 0}
+
+    def sort_by(column):
+        if sort_state["column"] == column:
+            sort_state["descending"] = not sort_state["descending"]
+        else:
+            sort_state["column"] = column
+            sort_state["descending"] = False
+        for heading in STUDENT_SORT_COLUMNS:
+            arrow = ""
+            if heading == sort_state["column"]:
+                arrow = " ▼" if sort_state["descending"] else " ▲"
+            students_tree.heading(heading, text=heading + arrow)
+        show_page(0)
+
+    for heading in STUDENT_SORT_COLUMNS:
+        students_tree.heading(heading, command=lambda c=heading: sort_by(c))
+    students_tree.heading("ID", text="ID ▲")
+
     students_tree.column("ID", width=60, anchor="center")
     students_tree.column("Student Number", width=130, anchor="center")
     students_tree.column("First Name", width=150, anchor="w")
@@ -756,21 +1595,102 @@ def admin_app():
     students_tree.pack(side="left", fill="both", expand=True)
     scrollbar.pack(side="right", fill="y")
 
-    # Load students
-    cursor.execute("SELECT id, student_number, first_name, middle_name, last_name, course FROM students")
-    for row in cursor.fetchall():
-        students_tree.insert("", "end", values=row)
-
-    # Count label
-    cursor.execute("SELECT COUNT(*) FROM students")
-    count = cursor.fetchone()[0]
-    tk.Label(students_inner, text=f"Total Students: {count}",
-             font=("Segoe UI", 12, "bold"), bg="white", fg="#616161").pack(anchor="w", pady=(20, 0))
+    # Count label and paging
+    footer = tk.Frame(students_inner, bg="white")
+    footer.pack(fill="x", pady=(20, 0))
+
+    count_label = tk.Label(footer, text="",
+                           font=("Segoe UI", 12, "bold"), bg="white", fg="#616161")
+    count_label.pack(side="left")
+
+    next_button = ModernButton(footer, text="Next ▶", command=lambda: show_page(sort_state["page"] + 1),
+                               bg="#1976d2", fg="white", font=("Segoe UI", 10, "bold"),
+                               relief="flat", cursor="hand2", activebackground="#1565c0",
+                               padx=15, pady=6)
+    next_button.pack(side="right")
+
+    page_label = tk.Label(footer, text="", font=("Segoe UI", 11), bg="white", fg="#616161")
+    page_label.pack(side="right", padx=15)
+
+    prev_button = ModernButton(footer, text="◀ Prev", command=lambda: show_page(sort_state["page"] - 1),
+                               bg="#1976d2", fg="white", font=("Segoe UI", 10, "bold"),
+                               relief="flat", cursor="hand2", activebackground="#1565c0",
+                               padx=15, pady=6)
+    prev_button.pack(side="right")
+
+    # Load one page of students; only that page is ever inserted into the tree
+    def show_page(page):
+        course = course_filter_var.get()
+        rows, total = query_students(sort_state["column"], sort_state["descending"],
+                                     course=None if course == ALL_COURSES else course,
+                                     failing_only=failing_var.get(),
+                                     offset=max(page, 0) * STUDENTS_PAGE_SIZE)
+        pages = max((total + STUDENTS_PAGE_SIZE - 1) // STUDENTS_PAGE_SIZE, 1)
+        if page >= pages and page > 0:
+            show_page(pages - 1)
+            return
+        sort_state["page"] = max(page, 0)
+
+        students_tree.delete(*students_tree.get_children())
+        shown_students.clear()
+        for student in rows:
+            iid = students_tree.insert("", "end", values=(student.id, student.student_number, student.first_name,
+                                                          student.middle_name, student.last_name, student.course))
+            shown_students[iid] = student
+
+        count_label.config(text=f"Total Students: {total}")
+        page_label.config(text=f"Page {sort_state['page'] + 1} of {pages}")
+        prev_button.config(state="normal" if sort_state["page"] > 0 else "disabled")
+        next_button.config(state="normal" if sort_state["page"] < pages - 1 else "disabled")
+
+    def load_students():
+        course_filter.config(values=[ALL_COURSES] + student_courses())
+        show_page(sort_state["page"])
+
+    course_filter.bind("<<ComboboxSelected>>", lambda e: show_page(0))
+    load_students()
+
+    # Pick up students added or deleted by other admins (and grades, for the failing filter)
+    global change_watcher
+    change_watcher = ChangeWatcher(root)
+    change_watcher.subscribe(load_students, kinds=["students", "grades"])
+    MaintenanceScheduler(root)
+    if durable_db_file is not None:
+        DatabaseFlusher(root)
 
     root.mainloop()
 
 
 # -------- EDIT GRADES WINDOW --------
+PERIOD_NAMES = ("Prelim", "Midterm", "Finals")
+
+
+def same_grade(a, b):
+    """Grades compare as numbers, so '1.0' and 1.00 are the same grade"""
+    try:
+        return float(a) == float(b)
+    except (TypeError, ValueError):
+        return a == b
+
+
+def merge_periods(base, mine, theirs):
+    """Three-way merge of (prelim, midterm, finals) edited by two people from the same base
+
+    A period only one side changed takes that side's value. Returns (merged, conflicts)
+    where conflicts are the indexes both sides changed differently; merged keeps mine there.
+    """
+    merged = []
+    conflicts = []
+    for i, (b, m, t) in enumerate(zip(base, mine, theirs)):
+        if same_grade(m, b):
+            merged.append(t)
+        else:
+            merged.append(m)
+            if not same_grade(t, b) and not same_grade(t, m):
+                conflicts.append(i)
+    return tuple(merged), conflicts
+
+
 def edit_grades_window(student_id, student_name):
     edit_win = tk.Toplevel()
     edit_win.title(f"Edit Grades - {student_name}")
@@ -826,7 +1746,7 @@ def edit_grades_window(student_id, student_name):
     tree_frame.pack(fill="both", expand=True)
 
     grades_tree = ttk.Treeview(tree_frame,
-                               columns=("ID", "Code", "Description", "Units", "Prelim", "Midterm", "Final"),
+                               columns=("ID", "Code", "Description", "Units", "Prelim", "Midterm", "Finals", "Final"),
                                show="headings", height=14)
 
     grades_tree.heading("ID", text="ID")
@@ -835,6 +1755,7 @@ def edit_grades_window(student_id, student_name):
     grades_tree.heading("Units", text="Units")
     grades_tree.heading("Prelim", text="Prelim")
     grades_tree.heading("Midterm", text="Midterm")
+    grades_tree.heading("Finals", text="Finals")
     grades_tree.heading("Final", text="Final Grade")
 
     grades_tree.column("ID", width=50, anchor="center")
@@ -843,6 +1764,7 @@ def edit_grades_window(student_id, student_name):
     grades_tree.column("Units", width=70, anchor="center")
     grades_tree.column("Prelim", width=100, anchor="center")
     grades_tree.column("Midterm", width=100, anchor="center")
+    grades_tree.column("Finals", width=100, anchor="center")
     grades_tree.column("Final", width=100, anchor="center")
 
     scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=grades_tree.yview)
@@ -850,14 +1772,17 @@ def edit_grades_window(student_id, student_name):
     grades_tree.pack(side="left", fill="both", expand=True)
     scrollbar.pack(side="right", fill="y")
 
+    # Treeview item id -> Grade row being shown
+    shown_grades = {}
+
     def load_grades():
-        for row in grades_tree.get_children():
-            grades_tree.delete(row)
-        cursor.execute(
-            "SELECT id, subject_code, subject_desc, units, prelim, midterm, final_grade FROM grades WHERE student_id=? AND semester=?",
-            (student_id, semester_var.get()))
-        for row in cursor.fetchall():
-            grades_tree.insert("", "end", values=row)
+        grades_tree.delete(*grades_tree.get_children())
+        shown_grades.clear()
+        semester = semester_var.get()
+        for g in grades_repo.for_student(student_id, semester, grades_table(semester)):
+            iid = grades_tree.insert("", "end", values=(g.id, g.subject_code, g.subject_desc, g.units,
+                                                        g.prelim, g.midterm, g.finals, g.final_grade))
+            shown_grades[iid] = g
 
     def edit_selected_grade():
         selection = grades_tree.selection()
@@ -865,12 +1790,7 @@ def edit_grades_window(student_id, student_name):
             messagebox.showwarning("No Selection", "Please select a grade to edit.")
             return
 
-        item = grades_tree.item(selection[0])
-        grade_id = item['values'][0]
-        subject_desc = item['values'][2]
-        current_prelim = item['values'][4]
-        current_midterm = item['values'][5]
-        current_final = item['values'][6]
+        grade = shown_grades[selection[0]]
 
         # COMPACT EDIT DIALOG
         edit_dlg = tk.Toplevel(edit_win)
@@ -893,44 +1813,87 @@ def edit_grades_window(student_id, student_name):
         form = tk.Frame(edit_dlg, bg="#f8f9fa")
         form.pack(fill="both", expand=True, padx=35, pady=25)
 
-        tk.Label(form, text=subject_desc, font=("Segoe UI", 10, "bold"),
+        tk.Label(form, text=grade.subject_desc, font=("Segoe UI", 10, "bold"),
                  bg="#f8f9fa", fg="#424242", wraplength=340).pack(pady=(0, 20))
 
         # Prelim
         tk.Label(form, text="Prelim Grade", font=("Segoe UI", 9, "bold"),
                  bg="#f8f9fa", fg="#616161").pack(anchor="w", pady=(0, 5))
         prelim_entry = tk.Entry(form, font=("Segoe UI", 11), relief="solid", bd=1)
-        prelim_entry.insert(0, current_prelim)
+        prelim_entry.insert(0, grade.prelim)
         prelim_entry.pack(fill="x", ipady=8, pady=(0, 15))
 
         # Midterm
         tk.Label(form, text="Midterm Grade", font=("Segoe UI", 9, "bold"),
                  bg="#f8f9fa", fg="#616161").pack(anchor="w", pady=(0, 5))
         midterm_entry = tk.Entry(form, font=("Segoe UI", 11), relief="solid", bd=1)
-        midterm_entry.insert(0, current_midterm)
+        midterm_entry.insert(0, grade.midterm)
         midterm_entry.pack(fill="x", ipady=8, pady=(0, 15))
 
-        # Final
-        tk.Label(form, text="Final Grade", font=("Segoe UI", 9, "bold"),
+        # Finals (the final grade itself is computed by the grading policy)
+        tk.Label(form, text="Finals Grade", font=("Segoe UI", 9, "bold"),
                  bg="#f8f9fa", fg="#616161").pack(anchor="w", pady=(0, 5))
-        final_entry = tk.Entry(form, font=("Segoe UI", 11), relief="solid", bd=1)
-        final_entry.insert(0, current_final)
-        final_entry.pack(fill="x", ipady=8, pady=(0, 22))
+        finals_entry = tk.Entry(form, font=("Segoe UI", 11), relief="solid", bd=1)
+        finals_entry.insert(0, grade.finals)
+        finals_entry.pack(fill="x", ipady=8, pady=(0, 22))
 
-        def save_changes():
+        def show_periods(values):
+            for entry, value in zip((prelim_entry, midterm_entry, finals_entry), values):
+                entry.delete(0, "end")
+                entry.insert(0, value)
+
+        def save_changes(merged=False):
+            nonlocal grade
             try:
-                p = float(prelim_entry.get())
-                m = float(midterm_entry.get())
-                f = float(final_entry.get())
-
-                cursor.execute("UPDATE grades SET prelim=?, midterm=?, final_grade=? WHERE id=?",
-                               (p, m, f, grade_id))
-                conn.commit()
-                messagebox.showinfo("Success", "Grade updated successfully!")
-                edit_dlg.destroy()
-                load_grades()
+                mine = (float(prelim_entry.get()), float(midterm_entry.get()), float(finals_entry.get()))
             except ValueError:
                 messagebox.showerror("Error", "Please enter valid numbers!")
+                return
+            final_grade = grading_policy.final_grade(*mine)
+            table = grades_table(grade.semester)
+
+            # Only succeeds if nobody saved this grade since it was loaded into the dialog
+            if not grades_repo.update_periods(grade.id, *mine, final_grade, grade.version, table):
+                # Release the write lock the failed UPDATE took before prompting
+                conn.rollback()
+                current = grades_repo.get(grade.id, table)
+                if current is None:
+                    messagebox.showerror("Error", "This grade was deleted by someone else.", parent=edit_dlg)
+                    edit_dlg.destroy()
+                    load_grades()
+                    return
+                theirs = (current.prelim, current.midterm, current.finals)
+                result, conflicts = merge_periods((grade.prelim, grade.midterm, grade.finals), mine, theirs)
+                if conflicts:
+                    names = ", ".join(PERIOD_NAMES[i] for i in conflicts)
+                    answer = messagebox.askyesnocancel(
+                        "Grade Changed",
+                        f"Someone else changed {names} while you were editing.\n\n"
+                        f"Theirs: {' / '.join(str(v) for v in theirs)}\n"
+                        f"Yours:  {' / '.join(str(v) for v in mine)}\n\n"
+                        "Yes: save your values over theirs\n"
+                        "No: load their values to review\n"
+                        "Cancel: keep editing",
+                        parent=edit_dlg)
+                    if answer is None:
+                        return
+                    if not answer:
+                        grade = current
+                        show_periods(theirs)
+                        return
+                # Periods only one side changed are combined; retry against their version
+                grade = current
+                show_periods(result)
+                save_changes(merged=True)
+                return
+
+            outbox_repo.record_updates([grade.id], table)
+            record_change("grades", student_id, grade.semester)
+            conn.commit()
+            note = "\n\nMerged with changes saved by someone else." if merged else ""
+            messagebox.showinfo("Success", f"Grade updated successfully!\n\nFinal Grade: {final_grade:.2f}{note}")
+            edit_dlg.destroy()
+            load_grades()
 
         # RECTANGULAR CONFIRM BUTTON - visually pleasing
         tk.Button(form, text="✓ Confirm Changes", command=save_changes,
@@ -950,31 +1913,660 @@ def edit_grades_window(student_id, student_name):
     semester_dropdown.bind("<<ComboboxSelected>>", lambda e: load_grades())
     load_grades()
 
+    # Grades of this student edited elsewhere (another admin, a recompute)
+    if change_watcher is not None:
+        token = change_watcher.subscribe(load_grades, kinds=["grades"], student_id=student_id)
+        edit_win.bind("<Destroy>", lambda e: change_watcher.unsubscribe(token) if e.widget is edit_win else None)
+
+
+# -------- CLASS ROSTER WINDOW --------
+ROSTER_PAGE_SIZE = 100
+
+# Roster columns that can be edited in place -> index into (prelim, midterm, finals)
+ROSTER_EDITABLE_COLUMNS = {"Prelim": 0, "Midterm": 1, "Finals": 2}
+
+
+def roster_window():
+    """Every student's grades in one subject and semester, edited in place and saved in one batch"""
+    roster_win = tk.Toplevel()
+    roster_win.title("Class Roster")
+    roster_win.state('zoomed')
+    roster_win.configure(bg="#f0f2f5")
+
+    # grade_id -> (RosterEntry as loaded, edited (prelim, midterm, finals))
+    pending = {}
+    # Treeview item id -> RosterEntry of the page being shown
+    shown_rows = {}
+    # Page and class (semester, subject dropdown text) being shown; pending edits belong to this class
+    page_state = {"page": 0, "semester": None, "subject": None}
+    editor = {}
+
+    def confirm_discard():
+        return not pending or messagebox.askyesno(
+            "Unsaved Changes", f"Discard {len(pending)} unsaved grade changes?", parent=roster_win)
+
+    def close():
+        if confirm_discard():
+            roster_win.destroy()
+
+    roster_win.protocol("WM_DELETE_WINDOW", close)
+
+    # Header
+    header = tk.Frame(roster_win, bg="#1976d2", height=100)
+    header.pack(fill="x")
+    header.pack_propagate(False)
+
+    header_text = tk.Frame(header, bg="#1976d2")
+    header_text.pack(side="left", fill="y", padx=30, pady=20)
+
+    tk.Label(header_text, text="📋 Class Roster", font=("Segoe UI", 26, "bold"),
+             fg="white", bg="#1976d2").pack(anchor="w")
+    tk.Label(header_text, text="Double-click a Prelim, Midterm or Finals cell to edit it",
+             font=("Segoe UI", 13), fg="#bbdefb", bg="#1976d2").pack(anchor="w")
+
+    ModernButton(header, text="Close", command=close,
+                 bg="#6c757d", fg="white", font=("Segoe UI", 12, "bold"),
+                 relief="flat", cursor="hand2", activebackground="#5a6268",
+                 padx=35, pady=14).pack(side="right", padx=20)
+
+    # Content
+    content = tk.Frame(roster_win, bg="#f0f2f5")
+    content.pack(fill="both", expand=True, padx=30, pady=30)
+
+    # Semester and subject selectors
+    selector_frame = tk.Frame(content, bg="#f0f2f5")
+    selector_frame.pack(fill="x", pady=(0, 20))
+
+    tk.Label(selector_frame, text="📚 Semester:", font=("Segoe UI", 13, "bold"),
+             bg="#f0f2f5", fg="#212529").pack(side="left", padx=(0, 15))
+
+    semester_var = tk.StringVar()
+    semester_dropdown = ttk.Combobox(selector_frame, textvariable=semester_var,
+                                     values=list(semester_subjects.keys()),
+                                     state="readonly", font=("Segoe UI", 11), width=32)
+    semester_dropdown.pack(side="left", padx=(0, 25))
+    semester_dropdown.current(len(semester_subjects) - 1)
+
+    tk.Label(selector_frame, text="📖 Subject:", font=("Segoe UI", 13, "bold"),
+             bg="#f0f2f5", fg="#212529").pack(side="left", padx=(0, 15))
+
+    subject_var = tk.StringVar()
+    subject_dropdown = ttk.Combobox(selector_frame, textvariable=subject_var,
+                                    state="readonly", font=("Segoe UI", 11), width=55)
+    subject_dropdown.pack(side="left")
+
+    # Roster card
+    roster_card = tk.Frame(content, bg="white", relief="solid", bd=1)
+    roster_card.pack(fill="both", expand=True)
+
+    roster_inner = tk.Frame(roster_card, bg="white")
+    roster_inner.pack(fill="both", expand=True, padx=30, pady=25)
+
+    average_label = tk.Label(roster_inner, text="", font=("Segoe UI", 12, "bold"),
+                             bg="white", fg="#1976d2")
+    average_label.pack(anchor="w", pady=(0, 15))
+
+    tree_frame = tk.Frame(roster_inner, bg="white")
+    tree_frame.pack(fill="both", expand=True)
+
+    roster_tree = ttk.Treeview(tree_frame,
+                               columns=("Number", "Name", "Prelim", "Midterm", "Finals", "Final"),
+                               show="headings", height=16)
+
+    roster_tree.heading("Number", text="Student Number")
+    roster_tree.heading("Name", text="Name")
+    roster_tree.heading("Prelim", text="Prelim")
+    roster_tree.heading("Midterm", text="Midterm")
+    roster_tree.heading("Finals", text="Finals")
+    roster_tree.heading("Final", text="Final Grade")
+
+    roster_tree.column("Number", width=150, anchor="center")
+    roster_tree.column("Name", width=350, anchor="w")
+    roster_tree.column("Prelim", width=100, anchor="center")
+    roster_tree.column("Midterm", width=100, anchor="center")
+    roster_tree.column("Finals", width=100, anchor="center")
+    roster_tree.column("Final", width=100, anchor="center")
+
+    roster_tree.tag_configure("edited", background="#fff3cd")
+
+    scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=roster_tree.yview)
+    roster_tree.configure(yscrollcommand=scrollbar.set)
+    roster_tree.pack(side="left", fill="both", expand=True)
+    scrollbar.pack(side="right", fill="y")
+
+    # Actions and paging
+    footer = tk.Frame(roster_inner, bg="white")
+    footer.pack(fill="x", pady=(20, 0))
+
+    save_button = ModernButton(footer, text="💾 Save Changes", command=lambda: save_edits(),
+                               bg="#28a745", fg="white", font=("Segoe UI", 12, "bold"),
+                               relief="flat", cursor="hand2", activebackground="#218838",
+                               padx=25, pady=12)
+    save_button.pack(side="left", padx=(0, 10))
 
-# -------- INITIALIZE WITH SAMPLE DATA --------
-cursor.execute("SELECT COUNT(*) FROM students")
-if cursor.fetchone()[0] == 0:
-    default_password = "password"
-    hashed_default = hashlib.sha256(default_password.encode()).hexdigest()
-
-    for i in range(5):
-        first = f"Student{i + 1}"
-        middle = "M"
-        last = "Last"
-        course = "B.S. INFORMATION TECHNOLOGY"
-        student_number = str(random.randint(100000, 999999))
-        cursor.execute(
-            "INSERT INTO students (student_number, first_name, middle_name, last_name, course, password) VALUES (?,?,?,?,?,?)",
-            (student_number, first, middle, last, course, hashed_default))
-        sid = cursor.lastrowid
-
-        for sem, subjects in semester_subjects.items():
-            for code, desc, units in subjects:
-                pre, mid, fin = generate_realistic_grades(None)
-                cursor.execute(
-                    "INSERT INTO grades (student_id, subject_code, subject_desc, units, semester, prelim, midterm, final_grade) VALUES (?,?,?,?,?,?,?,?)",
-                    (sid, code, desc, units, sem, pre, mid, fin))
+    ModernButton(footer, text="↩️ Discard Changes", command=lambda: discard_edits(),
+                 bg="#6c757d", fg="white", font=("Segoe UI", 12, "bold"),
+                 relief="flat", cursor="hand2", activebackground="#5a6268",
+                 padx=25, pady=12).pack(side="left")
+
+    next_button = ModernButton(footer, text="Next ▶", command=lambda: show_page(page_state["page"] + 1),
+                               bg="#1976d2", fg="white", font=("Segoe UI", 10, "bold"),
+                               relief="flat", cursor="hand2", activebackground="#1565c0",
+                               padx=15, pady=6)
+    next_button.pack(side="right")
+
+    page_label = tk.Label(footer, text="", font=("Segoe UI", 11), bg="white", fg="#616161")
+    page_label.pack(side="right", padx=15)
+
+    prev_button = ModernButton(footer, text="◀ Prev", command=lambda: show_page(page_state["page"] - 1),
+                               bg="#1976d2", fg="white", font=("Segoe UI", 10, "bold"),
+                               relief="flat", cursor="hand2", activebackground="#1565c0",
+                               padx=15, pady=6)
+    prev_button.pack(side="right")
+
+    def selected_subject():
+        return subject_var.get().split(" — ")[0]
+
+    def update_save_button():
+        count = f" ({len(pending)})" if pending else ""
+        save_button.config(text=f"💾 Save Changes{count}", state="normal" if pending else "disabled")
+
+    def show_row(iid):
+        row = shown_rows[iid]
+        if row.grade_id in pending:
+            periods = pending[row.grade_id][1]
+            values = (row.student_number, row.name, *periods, grading_policy.final_grade(*periods))
+            roster_tree.item(iid, values=values, tags=("edited",))
+        else:
+            values = (row.student_number, row.name, row.prelim, row.midterm, row.finals, row.final_grade)
+            roster_tree.item(iid, values=values, tags=())
+
+    def show_summary(summary):
+        if summary.students == 0:
+            average_label.config(text="No students are enrolled in this subject.")
+            return
+
+        def fmt(value):
+            return f"{value:.2f}" if value is not None else "N/A"
+
+        average_label.config(
+            text=f"Class Average:     Prelim: {fmt(summary.prelim)}     Midterm: {fmt(summary.midterm)}     "
+                 f"Finals: {fmt(summary.finals)}     Final: {fmt(summary.final_grade)}     "
+                 f"({summary.students} students, {summary.failing} failing)")
+
+    # Only one page of the roster is ever loaded; the average covers the whole class
+    def show_page(page):
+        cancel_edit()
+        semester = semester_var.get()
+        subject_code = selected_subject()
+        table = grades_table(semester)
+        summary = grades_repo.class_summary(semester, subject_code, grading_policy.failing_threshold, table)
+        pages = max((summary.students + ROSTER_PAGE_SIZE - 1) // ROSTER_PAGE_SIZE, 1)
+        page = min(max(page, 0), pages - 1)
+        page_state.update(page=page, semester=semester, subject=subject_var.get())
+
+        roster_tree.delete(*roster_tree.get_children())
+        shown_rows.clear()
+        for row in grades_repo.roster(semester, subject_code, table, ROSTER_PAGE_SIZE, page * ROSTER_PAGE_SIZE):
+            iid = roster_tree.insert("", "end")
+            shown_rows[iid] = row
+            show_row(iid)
+
+        show_summary(summary)
+        page_label.config(text=f"Page {page + 1} of {pages}")
+        prev_button.config(state="normal" if page > 0 else "disabled")
+        next_button.config(state="normal" if page < pages - 1 else "disabled")
+        update_save_button()
+
+    def load_subjects():
+        subjects = [f"{code} — {desc}" for code, desc, units in semester_subjects[semester_var.get()]]
+        subject_dropdown.config(values=subjects)
+        subject_dropdown.current(0)
+
+    def change_class(reload_subjects):
+        if not confirm_discard():
+            # Keep editing the class the pending edits belong to
+            semester_var.set(page_state["semester"])
+            if reload_subjects:
+                load_subjects()
+            subject_var.set(page_state["subject"])
+            return
+        pending.clear()
+        if reload_subjects:
+            load_subjects()
+        show_page(0)
+
+    # In-place editing: an Entry is laid over the double-clicked cell
+    def start_edit(event):
+        cancel_edit()
+        if roster_tree.identify_region(event.x, event.y) != "cell":
+            return
+        iid = roster_tree.identify_row(event.y)
+        column = roster_tree.column(roster_tree.identify_column(event.x), "id")
+        if not iid or column not in ROSTER_EDITABLE_COLUMNS:
+            return
+        x, y, width, height = roster_tree.bbox(iid, column)
+        entry = tk.Entry(roster_tree, font=("Segoe UI", 11), justify="center", relief="solid", bd=1)
+        entry.insert(0, roster_tree.set(iid, column))
+        entry.select_range(0, "end")
+        entry.place(x=x, y=y, width=width, height=height)
+        entry.focus_set()
+        entry.bind("<Return>", lambda e: finish_edit())
+        entry.bind("<FocusOut>", lambda e: finish_edit())
+        entry.bind("<Escape>", lambda e: cancel_edit())
+        editor.update(entry=entry, iid=iid, index=ROSTER_EDITABLE_COLUMNS[column])
+
+    def cancel_edit():
+        entry = editor.pop("entry", None)
+        if entry is not None:
+            entry.destroy()
+
+    def finish_edit():
+        entry = editor.pop("entry", None)
+        if entry is None:
+            return
+        text = entry.get().strip()
+        entry.destroy()
+        try:
+            value = float(text)
+        except ValueError:
+            messagebox.showerror("Error", "Please enter a valid number!", parent=roster_win)
+            return
+
+        row = shown_rows[editor["iid"]]
+        periods = list(pending[row.grade_id][1] if row.grade_id in pending else (row.prelim, row.midterm, row.finals))
+        periods[editor["index"]] = value
+        if all(same_grade(new, old) for new, old in zip(periods, (row.prelim, row.midterm, row.finals))):
+            pending.pop(row.grade_id, None)
+        else:
+            pending[row.grade_id] = (row, tuple(periods))
+        show_row(editor["iid"])
+        update_save_button()
+
+    def discard_edits():
+        cancel_edit()
+        if pending and messagebox.askyesno("Discard Changes", f"Discard {len(pending)} unsaved grade changes?",
+                                           parent=roster_win):
+            pending.clear()
+            show_page(page_state["page"])
+
+    # All edits are written in one transaction, each checked against the version it was loaded at
+    def save_edits():
+        finish_edit()
+        if not pending:
+            return
+        semester = page_state["semester"]
+        table = grades_table(semester)
+        changes = [(*periods, grading_policy.final_grade(*periods), row.grade_id, row.version)
+                   for row, periods in pending.values()]
+
+        if grades_repo.update_many(changes, table):
+            outbox_repo.record_updates(list(pending), table)
+            for row, periods in pending.values():
+                record_change("grades", row.student_id, semester)
+            conn.commit()
+            saved = len(pending)
+            pending.clear()
+            show_page(page_state["page"])
+            messagebox.showinfo("Success", f"{saved} grades updated successfully!", parent=roster_win)
+            return
+
+        # Someone else saved some of these grades since they were loaded: nothing was written
+        conn.rollback()
+        current = {g.id: g for g in grades_repo.get_many(list(pending), table)}
+
+        def names(rows):
+            listed = "\n".join(row.name for row in rows[:10])
+            if len(rows) > 10:
+                listed += f"\n… and {len(rows) - 10} more"
+            return listed
+
+        deleted = [row for row, periods in pending.values() if row.grade_id not in current]
+        for row in deleted:
+            del pending[row.grade_id]
+        if deleted:
+            messagebox.showwarning(
+                "Grades Deleted",
+                f"These grades were deleted by someone else, so your edits to them were dropped:\n\n{names(deleted)}",
+                parent=roster_win)
+
+        stale = [(row, periods) for row, periods in pending.values() if current[row.grade_id].version != row.version]
+        if not stale:
+            # Only deletions got in the way: save the rest
+            if pending:
+                save_edits()
+            else:
+                show_page(page_state["page"])
+            return
+
+        keep_mine = messagebox.askyesnocancel(
+            "Grades Changed",
+            f"Nothing was saved: someone else changed the grades of\n\n{names([row for row, periods in stale])}\n\n"
+            "Yes: save your values over theirs\n"
+            "No: drop your edits for these students and load theirs\n"
+            "Cancel: keep editing",
+            parent=roster_win)
+        for row, periods in stale:
+            if keep_mine:
+                g = current[row.grade_id]
+                rebased = replace(row, prelim=g.prelim, midterm=g.midterm, finals=g.finals,
+                                  final_grade=g.final_grade, version=g.version)
+                pending[row.grade_id] = (rebased, periods)
+            elif keep_mine is not None:
+                del pending[row.grade_id]
+        if keep_mine:
+            save_edits()
+        else:
+            show_page(page_state["page"])
+
+    roster_tree.bind("<Double-1>", start_edit)
+    semester_dropdown.bind("<<ComboboxSelected>>", lambda e: change_class(reload_subjects=True))
+    subject_dropdown.bind("<<ComboboxSelected>>", lambda e: change_class(reload_subjects=False))
+    load_subjects()
+    show_page(0)
+
+    # Grades saved elsewhere show up on the current page; pending edits stay on top
+    if change_watcher is not None:
+        def refresh():
+            # Leave a cell that is being typed into alone; the next change refreshes it
+            if "entry" not in editor:
+                show_page(page_state["page"])
+
+        token = change_watcher.subscribe(refresh, kinds=["grades"])
+        roster_win.bind("<Destroy>", lambda e: change_watcher.unsubscribe(token) if e.widget is roster_win else None)
+
+
+# -------- DATABASE MAINTENANCE --------
+# Open windows run maintenance one small step at a time, only when nobody has
+# touched the window for a while or during off-hours, so users never wait on it.
+MAINTENANCE_TICK_MS = 30 * 1000
+IDLE_SECONDS = 120
+OFF_HOURS = (22, 6)  # 10 PM to 6 AM
+ANALYSIS_LIMIT = 1000  # rows sampled per index by ANALYZE
+VACUUM_PAGES_PER_STEP = 256
+FREELIST_THRESHOLD = 1024  # free pages before incremental vacuum kicks in
+RETRY_SECONDS = 60 * 60  # wait after a failed run before trying the task again
+
+# task: (minimum seconds between runs, off-hours only)
+MAINTENANCE_TASKS = {
+    "enable_incremental_vacuum": (0, True),
+    "incremental_vacuum": (0, False),
+    "optimize": (60 * 60, False),
+    "analyze": (24 * 60 * 60, False),
+    "integrity_check": (7 * 24 * 60 * 60, True),
+}
+
+
+def database_stats():
+    """(size in bytes, page count, free pages) of the main database"""
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    freelist_count = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return page_count * page_size, page_count, freelist_count
+
+
+def last_maintenance(task):
+    """(seconds since the last run, its result) of a task; (None, None) if it never ran"""
+    row = conn.execute("SELECT (julianday('now') - julianday(ran_at)) * 86400, result FROM maintenance_log "
+                       "WHERE task=? ORDER BY id DESC LIMIT 1", (task,)).fetchone()
+    return row if row else (None, None)
+
+
+def incremental_vacuum_enabled():
+    return conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+
+def in_off_hours(now=None):
+    hour = (now or datetime.now()).hour
+    start, end = OFF_HOURS
+    return hour >= start or hour < end
+
+
+def maintenance_due(task, off_hours):
+    interval, off_hours_only = MAINTENANCE_TASKS[task]
+    if off_hours_only and not off_hours:
+        return False
+    elapsed, result = last_maintenance(task)
+    # A failing task backs off instead of running (and logging) every tick
+    # and keeping the tasks after it from their turn
+    if result is not None and result.startswith("error") and elapsed < RETRY_SECONDS:
+        return False
+    if task == "enable_incremental_vacuum":
+        return not incremental_vacuum_enabled()
+    if task == "incremental_vacuum":
+        return incremental_vacuum_enabled() and database_stats()[2] > FREELIST_THRESHOLD
+    return elapsed is None or elapsed >= interval
+
+
+def run_maintenance_task(task):
+    """Run one maintenance task and log it; returns the result text"""
+    start = time.perf_counter()
+    try:
+        if task == "enable_incremental_vacuum":
+            # Switching auto_vacuum needs one full VACUUM; afterwards free pages
+            # can be returned a few at a time
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+            result = "ok"
+        elif task == "incremental_vacuum":
+            # executescript steps the pragma to completion; execute() would free a single page
+            conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_PAGES_PER_STEP});")
+            result = "ok"
+        elif task == "optimize":
+            conn.execute(f"PRAGMA analysis_limit={ANALYSIS_LIMIT}")
+            conn.execute("PRAGMA optimize")
+            result = "ok"
+        elif task == "analyze":
+            conn.execute(f"PRAGMA analysis_limit={ANALYSIS_LIMIT}")
+            conn.execute("ANALYZE")
+            result = "ok"
+        elif task == "integrity_check":
+            result = "; ".join(row[0] for row in conn.execute("PRAGMA quick_check(20)"))
+        else:
+            raise ValueError(f"Unknown maintenance task: {task}")
+    except sqlite3.Error as e:
+        result = f"error: {e}"
+    conn.commit()
+
+    size_bytes, page_count, freelist_count = database_stats()
+    conn.execute(
+        "INSERT INTO maintenance_log (task, duration_ms, size_bytes, page_count, freelist_count, result) VALUES (?,?,?,?,?,?)",
+        (task, (time.perf_counter() - start) * 1000, size_bytes, page_count, freelist_count, result))
     conn.commit()
+    return result
+
+
+def run_due_maintenance(off_hours=None, limit=None):
+    """Run due tasks in MAINTENANCE_TASKS order (at most ``limit``); returns {task: result}"""
+    if off_hours is None:
+        off_hours = in_off_hours()
+    results = {}
+    for task in MAINTENANCE_TASKS:
+        if limit is not None and len(results) >= limit:
+            break
+        if maintenance_due(task, off_hours):
+            results[task] = run_maintenance_task(task)
+    return results
+
+
+class MaintenanceScheduler:
+    """Runs at most one due maintenance task per tick while the window is idle or off-hours"""
+
+    def __init__(self, widget, tick_ms=MAINTENANCE_TICK_MS):
+        self.widget = widget
+        self.tick_ms = tick_ms
+        self.last_input = time.monotonic()
+        for sequence in ("<Any-KeyPress>", "<Any-ButtonPress>", "<Motion>"):
+            widget.bind_all(sequence, self.touch, add="+")
+        self.widget.after(self.tick_ms, self.tick)
+
+    def touch(self, event=None):
+        self.last_input = time.monotonic()
+
+    def tick(self):
+        try:
+            if not self.widget.winfo_exists():
+                return
+        except tk.TclError:
+            return
+        off_hours = in_off_hours()
+        idle = time.monotonic() - self.last_input >= IDLE_SECONDS
+        # Never commit someone else's half-done transaction
+        if (idle or off_hours) and not conn.in_transaction:
+            # A full VACUUM blocks, so it also waits for an idle window at night
+            run_due_maintenance(off_hours=off_hours and idle, limit=1)
+        self.widget.after(self.tick_ms, self.tick)
+
+
+# -------- GRADE SHEET IMPORT --------
+def import_grades(path, workers=None):
+    """Upsert an instructor's CSV grade sheet; returns (imported, rejected, reject report path)"""
+    from gradesheet import import_grade_sheet
+
+    if conn.in_transaction:
+        conn.commit()
+    result = import_grade_sheet(conn, path, semester_subjects, archived_school_years(), grading_policy,
+                                workers=workers)
+    if result[0]:
+        record_change("grades")
+        conn.commit()
+    return result
+
+
+# -------- SAMPLE DATA --------
+def seed_command(count, seed=None):
+    """Add simulated students and publish every semester so they can log in right away"""
+    global SIMULATION_SEED
+    SIMULATION_SEED = seed
+    seed_sample_students(count)
+    for sem in semester_subjects.keys():
+        publish_grades(sem)
+    print(f"Added {count} students (password: password) and published {len(semester_subjects)} semesters.")
+
+
+# -------- GRADE EVENT OUTBOX --------
+# Where grade events are delivered (see outbox.py). Without this file no sink
+# runs and events stay in grade_events until one is configured.
+OUTBOX_SINKS_FILE = "outbox_sinks.json"
+outbox_dispatcher = None
+
+
+def outbox_sinks():
+    from outbox import load_sinks
+    try:
+        return load_sinks(OUTBOX_SINKS_FILE)
+    except (OSError, ValueError, TypeError, KeyError) as e:
+        print(f"Grade events: invalid {OUTBOX_SINKS_FILE}: {e}", file=sys.stderr)
+        return []
+
+
+def start_outbox_dispatcher():
+    """Deliver grade events in a background thread while the app is open"""
+    global outbox_dispatcher
+    # A :memory: database cannot be opened from the thread; its events are
+    # flushed with the data and delivered by the next run on a file
+    if working_db_file is None:
+        return
+    sinks = outbox_sinks()
+    if sinks:
+        from outbox import OutboxDispatcher
+        outbox_dispatcher = OutboxDispatcher(working_db_file, sinks)
+        outbox_dispatcher.start()
+
+
+def stop_outbox_dispatcher():
+    if outbox_dispatcher is not None:
+        outbox_dispatcher.stop(timeout=10)
+
+
+# -------- QUERY STATS --------
+def print_query_stats():
+    """Where this session spent its database time (see repository.Repo)"""
+    from repository import query_report
+
+    print(f"{'statement':<40} {'calls':>8} {'total ms':>10} {'avg ms':>8}")
+    for repo, name, calls, total_ms in query_report():
+        print(f"{repo + '.' + name:<40} {calls:8} {total_ms:10.1f} {total_ms / calls:8.3f}")
+
+
+# -------- ENTRY POINT --------
+def main(argv=None):
+    global FLUSH_INTERVAL_SECONDS
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Student Information System")
+    parser.add_argument("--exit-after-first-window", action="store_true",
+                        help="close as soon as the login window is drawn (used by startup_benchmark.py)")
+    parser.add_argument("--db", default=DB_FILE, help=f"database file (default: {DB_FILE})")
+    parser.add_argument("--storage", choices=STORAGE_MODES, default="disk",
+                        help="run on the file directly, or on a RAM copy flushed back to it (memory, tmpfs)")
+    parser.add_argument("--flush-interval", type=float, default=FLUSH_INTERVAL_SECONDS,
+                        help="seconds between flushes of the RAM copy while a window is open")
+    parser.add_argument("--query-stats", action="store_true",
+                        help="print time spent per repository statement when the program exits")
+    commands = parser.add_subparsers(dest="command")
+    seed_parser = commands.add_parser("seed", help="add simulated students with grades")
+    seed_parser.add_argument("--count", type=int, default=5)
+    seed_parser.add_argument("--seed", type=int, default=None, help="random seed for reproducible data")
+    import_parser = commands.add_parser("import-grades", help="import a CSV grade sheet")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--workers", type=int, default=None, help="validation processes (default: all CPUs)")
+    maintenance_parser = commands.add_parser("maintenance", help="run due database maintenance now")
+    maintenance_parser.add_argument("--all", action="store_true", help="run every task, due or not")
+    maintenance_parser.add_argument("--history", action="store_true", help="show recent maintenance runs")
+    commands.add_parser("dispatch-events", help=f"deliver pending grade events to the sinks in {OUTBOX_SINKS_FILE}")
+    args = parser.parse_args(argv)
+
+    FLUSH_INTERVAL_SECONDS = args.flush_interval
+    if args.query_stats:
+        atexit.register(print_query_stats)
+    open_database(args.db, args.storage)
+    load_grading_policy()
+
+    if args.command == "seed":
+        seed_command(args.count, args.seed)
+        return
+    if args.command == "import-grades":
+        from gradesheet import GradeSheetError
+        try:
+            imported, rejected, report = import_grades(args.path, args.workers)
+        except (OSError, GradeSheetError) as e:
+            sys.exit(f"Import failed: {e}")
+        print(f"Imported {imported} grades, rejected {rejected}.")
+        if report:
+            print(f"Rejected rows: {report}")
+        return
+    if args.command == "maintenance":
+        if args.history:
+            for row in conn.execute("SELECT ran_at, task, duration_ms, size_bytes, freelist_count, result "
+                                    "FROM maintenance_log ORDER BY id DESC LIMIT 20"):
+                print(f"{row[0]}  {row[1]:<26} {row[2]:8.1f} ms  {row[3] / 1048576:8.2f} MB  "
+                      f"{row[4]:6} free pages  {row[5]}")
+            return
+        if args.all:
+            results = {task: run_maintenance_task(task) for task in MAINTENANCE_TASKS
+                       if task != "enable_incremental_vacuum" or not incremental_vacuum_enabled()}
+        else:
+            results = run_due_maintenance(off_hours=True)
+        for task, result in results.items():
+            print(f"{task}: {result}")
+        return
+
+    if args.command == "dispatch-events":
+        from outbox import dispatch_pending
+        sinks = outbox_sinks()
+        if not sinks:
+            sys.exit(f"No grade event sinks configured in {OUTBOX_SINKS_FILE}.")
+        for sink, count in dispatch_pending(conn, sinks).items():
+            print(f"{sink}: {count} events")
+        return
+
+    start_outbox_dispatcher()
+    try:
+        login(exit_after_first_window=args.exit_after_first_window)
+    finally:
+        stop_outbox_dispatcher()
+
 
-# Start with login
-login()
+if __name__ == "__main__":
+    main()
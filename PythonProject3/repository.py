@@ -0,0 +1,507 @@
+import time
+from dataclasses import dataclass
+
+# -------- ROW OBJECTS --------
+# Compact, named rows instead of positional tuples / Treeview values.
+
+
+@dataclass(slots=True)
+class Student:
+    id: int
+    student_number: str
+    first_name: str
+    middle_name: str
+    last_name: str
+    course: str
+
+    @property
+    def full_name(self):
+        if self.middle_name:
+            return f"{self.first_name} {self.middle_name} {self.last_name}"
+        return f"{self.first_name} {self.last_name}"
+
+
+@dataclass(slots=True)
+class Grade:
+    id: int
+    student_id: int
+    subject_code: str
+    subject_desc: str
+    units: int
+    semester: str
+    prelim: str
+    midterm: str
+    finals: str
+    final_grade: str
+    # Incremented by every write; see GradeRepo.update_periods
+    version: int
+
+
+@dataclass(slots=True)
+class RosterEntry:
+    """One student's grade in a class roster"""
+    grade_id: int
+    student_id: int
+    student_number: str
+    first_name: str
+    middle_name: str
+    last_name: str
+    prelim: str
+    midterm: str
+    finals: str
+    final_grade: str
+    version: int
+
+    @property
+    def name(self):
+        if self.middle_name:
+            return f"{self.last_name}, {self.first_name} {self.middle_name}"
+        return f"{self.last_name}, {self.first_name}"
+
+
+@dataclass(slots=True)
+class ClassSummary:
+    """Size and average grades of one subject in one semester"""
+    students: int
+    prelim: float
+    midterm: float
+    finals: float
+    final_grade: float
+    failing: int
+
+
+@dataclass(slots=True)
+class ReleasedGrade:
+    subject_code: str
+    subject_desc: str
+    units: int
+    prelim: str
+    midterm: str
+    finals: str
+    final_grade: str
+
+
+@dataclass(slots=True)
+class ReleasedGwa:
+    total_units: int
+    prelim_gwa: float
+    midterm_gwa: float
+    finals_gwa: float
+    semester_gwa: float
+
+
+# Tables grade queries may be pointed at (see main.grades_table)
+GRADE_TABLES = ("grades", "archive.grades", "all_grades")
+
+
+# (repository, statement name) -> [calls, total seconds] for every repository in this process
+TIMINGS = {}
+
+
+def query_report():
+    """(repository, statement name, calls, total ms) sorted by total time"""
+    return sorted(((repo, name, calls, seconds * 1000) for (repo, name), (calls, seconds) in TIMINGS.items()),
+                  key=lambda row: row[3], reverse=True)
+
+
+class Repo:
+    """Shared plumbing: every statement goes through these methods, which time it by name.
+
+    Query times include fetching the rows. SQL strings are constants so
+    sqlite3's per-connection statement cache reuses the prepared statement
+    on every call.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def timed(self, name, start, calls=1):
+        stats = TIMINGS.setdefault((type(self).__name__, name), [0, 0.0])
+        stats[0] += calls
+        stats[1] += time.perf_counter() - start
+
+    def run(self, name, sql, params=(), many=False):
+        """Execute a write; returns the cursor for rowcount / lastrowid"""
+        start = time.perf_counter()
+        if many:
+            cur = self.conn.executemany(sql, params)
+        else:
+            cur = self.conn.execute(sql, params)
+        self.timed(name, start)
+        return cur
+
+    def fetch_all(self, name, sql, params=()):
+        start = time.perf_counter()
+        rows = self.conn.execute(sql, params).fetchall()
+        self.timed(name, start)
+        return rows
+
+    def fetch_one(self, name, sql, params=()):
+        start = time.perf_counter()
+        row = self.conn.execute(sql, params).fetchone()
+        self.timed(name, start)
+        return row
+
+    def stream(self, name, sql, params=(), size=1000):
+        """Yield rows of a large result ``size`` at a time; fetching is timed, the caller's work is not"""
+        start = time.perf_counter()
+        cur = self.conn.execute(sql, params)
+        calls = 1
+        while True:
+            rows = cur.fetchmany(size)
+            self.timed(name, start, calls)
+            if not rows:
+                return
+            yield from rows
+            start = time.perf_counter()
+            calls = 0
+
+
+def check_table(table):
+    if table not in GRADE_TABLES:
+        raise ValueError(f"Not a grades table: {table}")
+    return table
+
+
+# -------- STUDENTS --------
+STUDENT_COLUMNS = "id, student_number, first_name, middle_name, last_name, course"
+
+# Sortable columns of the admin list -> ORDER BY terms (each backed by an index)
+STUDENT_SORT_COLUMNS = {
+    "ID": ["id"],
+    "Student Number": ["student_number"],
+    "Last Name": ["last_name", "first_name", "id"],
+    "Course": ["course", "last_name", "first_name", "id"],
+}
+
+
+class StudentRepo(Repo):
+    AUTHENTICATE = f"SELECT {STUDENT_COLUMNS} FROM students WHERE student_number=? AND password=?"
+    INSERT = ("INSERT INTO students (student_number, first_name, middle_name, last_name, course, password) "
+              "VALUES (?,?,?,?,?,?)")
+    INSERT_WITH_ID = ("INSERT INTO students (id, student_number, first_name, middle_name, last_name, course, password) "
+                      "VALUES (?,?,?,?,?,?,?)")
+    DELETE = "DELETE FROM students WHERE id=?"
+    MAX_ID = "SELECT COALESCE(MAX(id), 0) FROM students"
+    ID_RANGE = "SELECT MIN(id), MAX(id) FROM students"
+    COURSES = "SELECT DISTINCT course FROM students ORDER BY course"
+    IDS_BY_NUMBER = "SELECT student_number, id FROM students"
+
+    def authenticate(self, student_number, password_hash):
+        row = self.fetch_one("authenticate", self.AUTHENTICATE, (student_number, password_hash))
+        return Student(*row) if row else None
+
+    def insert(self, student_number, first_name, middle_name, last_name, course, password_hash):
+        """Returns the new student id; raises sqlite3.IntegrityError for a duplicate student number"""
+        return self.run("insert", self.INSERT,
+                        (student_number, first_name, middle_name, last_name, course, password_hash)).lastrowid
+
+    def insert_many(self, rows):
+        """rows: (id, student_number, first_name, middle_name, last_name, course, password_hash)"""
+        self.run("insert_many", self.INSERT_WITH_ID, rows, many=True)
+
+    def delete(self, student_id):
+        self.run("delete", self.DELETE, (student_id,))
+
+    def max_id(self):
+        return self.fetch_one("max_id", self.MAX_ID)[0]
+
+    def id_range(self):
+        """(lowest, highest) student id; (None, None) without students"""
+        return self.fetch_one("id_range", self.ID_RANGE)
+
+    def courses(self):
+        return [row[0] for row in self.fetch_all("courses", self.COURSES) if row[0]]
+
+    def ids_by_number(self):
+        return dict(self.fetch_all("ids_by_number", self.IDS_BY_NUMBER))
+
+    def page(self, sort_column="ID", descending=False, course=None, failing_above=None, limit=100, offset=0,
+             grades_table="grades"):
+        """One page of students plus the number of matching students
+
+        failing_above: only students with a final grade above this value in
+        grades_table ("all_grades" to include archived years).
+        """
+        where = []
+        params = []
+        if course:
+            where.append("course = ?")
+            params.append(course)
+        if failing_above is not None:
+            where.append(f"id IN (SELECT student_id FROM {check_table(grades_table)} "
+                         "WHERE CAST(final_grade AS REAL) > ?)")
+            params.append(failing_above)
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+
+        direction = " DESC" if descending else ""
+        order_sql = ", ".join(term + direction for term in STUDENT_SORT_COLUMNS[sort_column])
+
+        total = self.fetch_one("page_count", f"SELECT COUNT(*) FROM students {where_sql}", params)[0]
+        rows = self.fetch_all("page", f"SELECT {STUDENT_COLUMNS} FROM students {where_sql} "
+                                f"ORDER BY {order_sql} LIMIT ? OFFSET ?", params + [limit, offset])
+        return [Student(*row) for row in rows], total
+
+
+# -------- GRADES --------
+GRADE_COLUMNS = ("id, student_id, subject_code, subject_desc, units, semester, prelim, midterm, finals, final_grade, "
+                 "version")
+
+
+class GradeRepo(Repo):
+    # Rows the whole-school recompute works on (see grading.changed_grades)
+    FINAL_GRADE_INPUTS = "SELECT id, prelim, midterm, finals, final_grade, version FROM grades"
+    FINAL_GRADE_INPUTS_FOR_STUDENTS = FINAL_GRADE_INPUTS + " WHERE student_id BETWEEN ? AND ?"
+    UPDATE_FINAL_GRADE = "UPDATE grades SET final_grade=?, version=version + 1 WHERE id=? AND version=?"
+    # Grade sheet rows: only the periods that were filled in are written. Needs
+    # the policy_final_grade(prelim, midterm, finals) SQL function on the connection.
+    UPSERT_PERIODS = """
+    INSERT INTO grades (student_id, subject_code, subject_desc, units, semester, prelim, midterm, finals, final_grade)
+    VALUES (:student_id, :subject_code, :subject_desc, :units, :semester, :prelim, :midterm, :finals,
+            policy_final_grade(:prelim, :midterm, :finals))
+    ON CONFLICT (student_id, semester, subject_code) DO UPDATE SET
+        prelim = COALESCE(excluded.prelim, prelim),
+        midterm = COALESCE(excluded.midterm, midterm),
+        finals = COALESCE(excluded.finals, finals),
+        final_grade = policy_final_grade(COALESCE(excluded.prelim, prelim),
+                                         COALESCE(excluded.midterm, midterm),
+                                         COALESCE(excluded.finals, finals)),
+        version = version + 1
+    """
+
+    def for_student(self, student_id, semester, table="grades"):
+        sql = f"SELECT {GRADE_COLUMNS} FROM {check_table(table)} WHERE student_id=? AND semester=?"
+        return [Grade(*row) for row in self.fetch_all("for_student", sql, (student_id, semester))]
+
+    def get_many(self, grade_ids, table="grades"):
+        grade_ids = list(grade_ids)
+        found = {}
+        for start in range(0, len(grade_ids), 500):
+            chunk = grade_ids[start:start + 500]
+            sql = f"SELECT {GRADE_COLUMNS} FROM {check_table(table)} WHERE id IN ({','.join('?' * len(chunk))})"
+            for row in self.fetch_all("get_many", sql, chunk):
+                found[row[0]] = Grade(*row)
+        return [found[gid] for gid in grade_ids if gid in found]
+
+    def count_for(self, student_id, semester, table="grades"):
+        sql = f"SELECT COUNT(*) FROM {check_table(table)} WHERE student_id=? AND semester=?"
+        return self.fetch_one("count_for", sql, (student_id, semester))[0]
+
+    def insert_many(self, rows, table="grades"):
+        """rows: (student_id, subject_code, subject_desc, units, semester, prelim, midterm, finals, final_grade)"""
+        sql = (f"INSERT INTO {check_table(table)} "
+               f"(student_id, subject_code, subject_desc, units, semester, prelim, midterm, finals, final_grade) "
+               f"VALUES (?,?,?,?,?,?,?,?,?)")
+        self.run("insert_many", sql, rows, many=True)
+
+    def get(self, grade_id, table="grades"):
+        row = self.fetch_one("get", f"SELECT {GRADE_COLUMNS} FROM {check_table(table)} WHERE id=?", (grade_id,))
+        return Grade(*row) if row else None
+
+    def update_periods(self, grade_id, prelim, midterm, finals, final_grade, expected_version, table="grades"):
+        """Compare-and-set: write only if the row is still at ``expected_version``
+
+        Returns False when someone else changed (or deleted) the grade in the meantime.
+        """
+        sql = (f"UPDATE {check_table(table)} SET prelim=?, midterm=?, finals=?, final_grade=?, version=version + 1 "
+               f"WHERE id=? AND version=?")
+        cur = self.run("update_periods", sql, (prelim, midterm, finals, final_grade, grade_id, expected_version))
+        return cur.rowcount == 1
+
+    def update_many(self, changes, table="grades"):
+        """Compare-and-set several grades at once
+
+        changes: (prelim, midterm, finals, final_grade, grade_id, expected_version).
+        Returns False if any of them was changed by someone else; the caller rolls back.
+        """
+        sql = (f"UPDATE {check_table(table)} SET prelim=?, midterm=?, finals=?, final_grade=?, version=version + 1 "
+               f"WHERE id=? AND version=?")
+        changes = list(changes)
+        return self.run("update_many", sql, changes, many=True).rowcount == len(changes)
+
+    def upsert_periods(self, rows):
+        """Insert or update grade sheet rows (dicts with student_id, subject_code, subject_desc,
+        units, semester, prelim, midterm, finals; a None period keeps the stored one)"""
+        self.run("upsert_periods", self.UPSERT_PERIODS, rows, many=True)
+
+    def final_grade_inputs(self, low_student_id, high_student_id):
+        """(id, prelim, midterm, finals, final_grade, version) of the students low..high_student_id"""
+        return self.fetch_all("final_grade_inputs", self.FINAL_GRADE_INPUTS_FOR_STUDENTS,
+                              (low_student_id, high_student_id))
+
+    def final_grade_inputs_by_id(self, grade_ids):
+        """Same rows as final_grade_inputs for the given grade ids"""
+        grade_ids = list(grade_ids)
+        rows = []
+        for start in range(0, len(grade_ids), 500):
+            chunk = grade_ids[start:start + 500]
+            sql = f"{self.FINAL_GRADE_INPUTS} WHERE id IN ({','.join('?' * len(chunk))})"
+            rows += self.fetch_all("final_grade_inputs_by_id", sql, chunk)
+        return rows
+
+    def update_final_grades(self, changes):
+        """Compare-and-set final grades; changes: (final_grade, grade_id, expected_version)
+
+        Returns how many were written; grades changed since they were read are skipped.
+        """
+        return self.run("update_final_grades", self.UPDATE_FINAL_GRADE, changes, many=True).rowcount
+
+    def roster(self, semester, subject_code, table="grades", limit=100, offset=0):
+        """One page of a subject's class list ordered by student name (uses idx_grades_semester_subject)"""
+        sql = (f"SELECT g.id, g.student_id, s.student_number, s.first_name, s.middle_name, s.last_name, "
+               f"g.prelim, g.midterm, g.finals, g.final_grade, g.version "
+               f"FROM {check_table(table)} g JOIN students s ON s.id = g.student_id "
+               f"WHERE g.semester=? AND g.subject_code=? "
+               f"ORDER BY s.last_name, s.first_name, s.id LIMIT ? OFFSET ?")
+        return [RosterEntry(*row) for row in self.fetch_all("roster", sql, (semester, subject_code, limit, offset))]
+
+    def class_summary(self, semester, subject_code, failing_above, table="grades"):
+        sql = (f"SELECT COUNT(*), AVG(CAST(prelim AS REAL)), AVG(CAST(midterm AS REAL)), "
+               f"AVG(CAST(finals AS REAL)), AVG(CAST(final_grade AS REAL)), "
+               f"COALESCE(SUM(CAST(final_grade AS REAL) > ?), 0) "
+               f"FROM {check_table(table)} WHERE semester=? AND subject_code=?")
+        return ClassSummary(*self.fetch_one("class_summary", sql, (failing_above, semester, subject_code)))
+
+    def delete_for_student(self, student_id, table="grades"):
+        self.run("delete_for_student", f"DELETE FROM {check_table(table)} WHERE student_id=?", (student_id,))
+
+
+# -------- PUBLISHED RELEASES --------
+class ReleaseRepo(Repo):
+    LATEST_VERSION = "SELECT MAX(version) FROM grade_releases WHERE semester=?"
+    LATEST = "SELECT version, published_at FROM grade_releases WHERE semester=? ORDER BY version DESC LIMIT 1"
+    SEMESTERS = "SELECT DISTINCT semester FROM grade_releases"
+    CREATE = "INSERT INTO grade_releases (semester) VALUES (?)"
+    GRADES = ("SELECT subject_code, subject_desc, units, prelim, midterm, finals, final_grade "
+              "FROM released_grades WHERE version=? AND student_id=?")
+    GWA = ("SELECT total_units, prelim_gwa, midterm_gwa, finals_gwa, semester_gwa "
+           "FROM released_gwa WHERE version=? AND student_id=?")
+    TOTAL_GWA = "SELECT total_gwa FROM released_gwa WHERE student_id=? ORDER BY version DESC LIMIT 1"
+    RELEASE_ROWS = ("SELECT student_id, units, prelim, midterm, finals, final_grade FROM released_grades "
+                    "WHERE version=? ORDER BY student_id")
+    LATEST_FINAL_GRADES = """
+    SELECT rg.student_id, rg.units, rg.final_grade
+    FROM released_grades rg
+    JOIN (SELECT MAX(version) AS version FROM grade_releases GROUP BY semester) latest
+      ON rg.version = latest.version
+    ORDER BY rg.student_id
+    """
+    INSERT_GWA = "INSERT INTO released_gwa VALUES (?,?,?,?,?,?,?,?)"
+    OLD_VERSIONS = "SELECT version FROM grade_releases WHERE semester=? ORDER BY version DESC LIMIT -1 OFFSET ?"
+
+    def latest_version(self, semester):
+        """Latest published version of a semester, or None if it was never published"""
+        return self.fetch_one("latest_version", self.LATEST_VERSION, (semester,))[0]
+
+    def latest(self, semester):
+        """(version, published_at) of the latest release, or None"""
+        return self.fetch_one("latest", self.LATEST, (semester,))
+
+    def semesters(self):
+        return {row[0] for row in self.fetch_all("semesters", self.SEMESTERS)}
+
+    def grades(self, version, student_id):
+        return [ReleasedGrade(*row) for row in self.fetch_all("grades", self.GRADES, (version, student_id))]
+
+    def gwa(self, version, student_id):
+        row = self.fetch_one("gwa", self.GWA, (version, student_id))
+        return ReleasedGwa(*row) if row else None
+
+    def total_gwa(self, student_id):
+        """Total GWA from the most recent release this student appears in"""
+        row = self.fetch_one("total_gwa", self.TOTAL_GWA, (student_id,))
+        return row[0] if row else None
+
+    def create(self, semester, table="grades"):
+        """Start a release and copy the semester's grades into it; returns the version"""
+        version = self.run("create", self.CREATE, (semester,)).lastrowid
+        self.run("snapshot", f"""
+        INSERT INTO released_grades
+        SELECT ?, student_id, id, subject_code, subject_desc, units, prelim, midterm, finals, final_grade
+        FROM {check_table(table)} WHERE semester=?
+        """, (version, semester))
+        return version
+
+    def release_rows(self, version):
+        """Rows of (student_id, units, prelim, midterm, finals, final_grade) ordered by student"""
+        return self.stream("release_rows", self.RELEASE_ROWS, (version,))
+
+    def latest_final_grades(self):
+        """Rows of (student_id, units, final_grade) of every semester's latest release"""
+        return self.stream("latest_final_grades", self.LATEST_FINAL_GRADES)
+
+    def insert_gwa(self, rows):
+        """rows: (version, student_id, total_units, prelim, midterm, finals, semester, total GWA)"""
+        self.run("insert_gwa", self.INSERT_GWA, rows, many=True)
+
+    def prune(self, semester, keep):
+        """Delete all but the newest ``keep`` releases of a semester"""
+        old = [(row[0],) for row in self.fetch_all("old_versions", self.OLD_VERSIONS, (semester, keep))]
+        self.run("prune_grades", "DELETE FROM released_grades WHERE version=?", old, many=True)
+        self.run("prune_gwa", "DELETE FROM released_gwa WHERE version=?", old, many=True)
+        self.run("prune_releases", "DELETE FROM grade_releases WHERE version=?", old, many=True)
+
+    def delete_student(self, student_id):
+        self.run("delete_student_grades", "DELETE FROM released_grades WHERE student_id=?", (student_id,))
+        self.run("delete_student_gwa", "DELETE FROM released_gwa WHERE student_id=?", (student_id,))
+
+
+# -------- GRADE EVENT OUTBOX --------
+EVENT_COLUMNS = ("seq", "kind", "grade_id", "student_id", "student_number", "subject_code", "semester",
+                 "prelim", "midterm", "finals", "final_grade", "created_at")
+
+
+class OutboxRepo(Repo):
+    """Grade change events written in the same transaction as the change itself"""
+
+    PENDING = f"SELECT {', '.join(EVENT_COLUMNS)} FROM grade_events WHERE seq > ? ORDER BY seq LIMIT ?"
+    CHECKPOINT = "SELECT last_seq FROM outbox_checkpoints WHERE sink=?"
+    SAVE_CHECKPOINT = """
+    INSERT INTO outbox_checkpoints (sink, last_seq) VALUES (?, ?)
+    ON CONFLICT (sink) DO UPDATE SET last_seq = excluded.last_seq, delivered_at = CURRENT_TIMESTAMP
+    """
+    PRUNE = "DELETE FROM grade_events WHERE seq <= ?"
+
+    @staticmethod
+    def event_sql(kind, table, where):
+        return f"""
+        INSERT INTO grade_events (kind, grade_id, student_id, student_number, subject_code, semester,
+                                  prelim, midterm, finals, final_grade)
+        SELECT '{kind}', g.id, g.student_id, s.student_number, g.subject_code, g.semester,
+               g.prelim, g.midterm, g.finals, g.final_grade
+        FROM {check_table(table)} g JOIN students s ON s.id = g.student_id
+        WHERE {where}
+        """
+
+    def record_inserts(self, keys, table="grades", kind="insert"):
+        """keys: (student_id, semester, subject_code) of rows just inserted into ``table``
+
+        Grade sheet imports pass kind="upsert", as a row may have existed already.
+        """
+        sql = self.event_sql(kind, table, "g.student_id=? AND g.semester=? AND g.subject_code=?")
+        self.run("record_inserts", sql, keys, many=True)
+
+    def record_updates(self, grade_ids, table="grades"):
+        sql = self.event_sql("update", table, "g.id=?")
+        self.run("record_updates", sql, [(grade_id,) for grade_id in grade_ids], many=True)
+
+    def record_student_deletes(self, student_id, table="grades"):
+        """Delete events (with the last grades) for every grade of a student; call before deleting them"""
+        sql = self.event_sql("delete", table, "g.student_id=?")
+        self.run("record_student_deletes", sql, (student_id,))
+
+    def pending(self, after_seq, limit):
+        """Events after ``after_seq`` as dicts, oldest first"""
+        return [dict(zip(EVENT_COLUMNS, row)) for row in self.fetch_all("pending", self.PENDING, (after_seq, limit))]
+
+    def checkpoint(self, sink):
+        """Last delivered seq of a sink (0 if it never received anything)"""
+        row = self.fetch_one("checkpoint", self.CHECKPOINT, (sink,))
+        return row[0] if row else 0
+
+    def save_checkpoint(self, sink, last_seq):
+        self.run("save_checkpoint", self.SAVE_CHECKPOINT, (sink, last_seq))
+
+    def prune(self, up_to_seq):
+        """Delete events every sink has received"""
+        return self.run("prune", self.PRUNE, (up_to_seq,)).rowcount
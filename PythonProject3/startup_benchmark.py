@@ -0,0 +1,71 @@
+"""Measure how fast the Student Information System starts.
+
+    python startup_benchmark.py [--runs 5]
+
+Reports
+  import time          - `import main` in a fresh interpreter
+  time to first window - launching `python main.py` until the login window is drawn
+
+Every run works in a scratch directory holding copies of the database and the
+files main.py reads at startup, so migrations and writes never touch the real
+sis.db. outbox_sinks.json is not copied: no grade events are delivered.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+MAIN_SCRIPT = os.path.join(APP_DIR, "main.py")
+
+# Files main.py opens relative to its working directory (the archive only exists once a year is archived)
+RUNTIME_FILES = ("sis.db", "sis_archive.db", "grading_policy.json", "adulogo.png")
+
+IMPORT_PROBE = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+
+def scratch_dir():
+    """Temporary working directory with copies of RUNTIME_FILES"""
+    work_dir = tempfile.TemporaryDirectory(prefix="sis-benchmark-")
+    for name in RUNTIME_FILES:
+        path = os.path.join(APP_DIR, name)
+        if os.path.exists(path):
+            shutil.copy2(path, work_dir.name)
+    return work_dir
+
+
+def measure_import():
+    env = dict(os.environ, PYTHONPATH=APP_DIR)
+    with scratch_dir() as work_dir:
+        out = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=work_dir, env=env,
+                             capture_output=True, text=True, check=True).stdout
+    return float(out.strip().splitlines()[-1])
+
+
+def measure_first_window():
+    with scratch_dir() as work_dir:
+        start = time.perf_counter()
+        subprocess.run([sys.executable, MAIN_SCRIPT, "--exit-after-first-window"], cwd=work_dir, check=True)
+        return time.perf_counter() - start
+
+
+def report(name, samples):
+    print(f"{name:<22} median {statistics.median(samples) * 1000:8.1f} ms   "
+          f"min {min(samples) * 1000:8.1f} ms   max {max(samples) * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    report("import time", [measure_import() for _ in range(args.runs)])
+    report("time to first window", [measure_first_window() for _ in range(args.runs)])
+
+
+if __name__ == "__main__":
+    main()